@@ -1,11 +1,213 @@
-from typing import TypedDict, Optional, Any
+from array import array
+from bisect import bisect_left
+from collections import Counter
+from dataclasses import dataclass
+from typing import TypedDict, Optional, Any, Literal
+from pydantic import BaseModel, Field
+from utils.helpers import normalize_location
+
+Intent = Literal["weather", "smalltalk", "other"]
+Units = Literal["metric", "imperial"]
+TimeRef = Literal["now", "today", "tonight", "tomorrow", "weekend", "later"]
+
+
+@dataclass(frozen=True)
+class Location:
+    """
+    A location resolved from a query, typed so the geocoder can go straight
+    to the right endpoint: coordinates need no lookup, postal codes use the
+    zip endpoint, names use direct geocoding.
+    """
+    kind: Literal["coords", "zip", "name"]
+    value: str
+    lat: Optional[float] = None
+    lon: Optional[float] = None
+
+    @property
+    def key(self) -> str:
+        return f"{self.kind}:{normalize_location(self.value)}"
+
+    def __str__(self) -> str:
+        return self.value
+
+
+class QueryExtraction(BaseModel):
+    """Structured output of the single LLM call that classifies and extracts a query."""
+    intent: Intent = Field(description="weather for weather questions, smalltalk for greetings/chit-chat, other otherwise")
+    location: Optional[str] = Field(None, description="The one location to look up: 'lat,lon', a postal code, or a clean city/region name. Null if none.")
+    location_type: Optional[Literal["coords", "zip", "name"]] = Field(None, description="What kind of value `location` is")
+    units: Units = Field("metric", description="imperial if the user asks for Fahrenheit/mph, else metric")
+    time_ref: TimeRef = Field("now", description="When the user is asking about")
+
+
+@dataclass(frozen=True)
+class ResolvedQuery:
+    """What the graph needs to know about a query before any cache or API work."""
+    intent: Intent
+    location: Optional[Location]
+    units: Units = "metric"
+    time_ref: TimeRef = "now"
+
+
+class WeatherSnapshot:
+    """
+    The fields we actually serve from an OpenWeather current-weather
+    payload. Stored in L1 and (via database.codec) in L2 instead of the
+    full payload; `raw` holds the original only when raw storage is on.
+    """
+    __slots__ = ("name", "country", "temp", "description", "humidity", "wind_speed", "dt", "lat", "lon", "raw")
+
+    def __init__(self, name=None, country=None, temp=None, description=None, humidity=None,
+                 wind_speed=None, dt=None, lat=None, lon=None, raw=None):
+        self.name = name
+        self.country = country
+        self.temp = temp
+        self.description = description
+        self.humidity = humidity
+        self.wind_speed = wind_speed
+        self.dt = dt
+        self.lat = lat
+        self.lon = lon
+        self.raw = raw
+
+    FIELDS = __slots__[:-1]
+
+    @classmethod
+    def from_payload(cls, payload: dict, keep_raw: bool = False) -> "WeatherSnapshot":
+        main = payload.get("main", {})
+        weather = (payload.get("weather") or [{}])[0]
+        coord = payload.get("coord", {})
+        return cls(
+            name=payload.get("name"),
+            country=payload.get("sys", {}).get("country"),
+            temp=main.get("temp"),
+            description=weather.get("description"),
+            humidity=main.get("humidity"),
+            wind_speed=payload.get("wind", {}).get("speed"),
+            dt=payload.get("dt"),
+            lat=coord.get("lat"),
+            lon=coord.get("lon"),
+            raw=payload if keep_raw else None,
+        )
+
+    def to_dict(self) -> dict:
+        return {field: getattr(self, field) for field in self.FIELDS}
+
+    def __eq__(self, other):
+        return isinstance(other, WeatherSnapshot) and self.to_dict() == other.to_dict()
+
+    def __repr__(self) -> str:
+        return f"WeatherSnapshot({self.name!r}, temp={self.temp}, {self.description!r})"
+
+
+@dataclass(frozen=True)
+class ForecastWindow:
+    """Aggregates of the forecast slots overlapping [start, end) (epoch seconds)."""
+    start: int
+    end: int
+    temp_min: float
+    temp_max: float
+    pop_max: float       # highest probability of precipitation, 0..1
+    precip_mm: float     # rain + snow over the window
+    wind_max: float
+    description: str     # most frequent condition
+    slots: int
+
+
+class ForecastSeries:
+    """
+    An OpenWeather 5-day/3-hour forecast as typed columns (`array`), one
+    element per slot in time order: 40 slots take a few hundred bytes
+    instead of a ~16 kB payload, and a time window is a bisect plus
+    min/max/sum over array slices. Conditions are indices into `labels`.
+    """
+    __slots__ = ("name", "country", "lat", "lon", "tz_offset",
+                 "dt", "temp", "pop", "precip", "wind_speed", "humidity", "conditions", "labels")
+
+    SLOT_SECONDS = 3 * 3600
+
+    def __init__(self, name=None, country=None, lat=None, lon=None, tz_offset=0, dt=None, temp=None, pop=None,
+                 precip=None, wind_speed=None, humidity=None, conditions=None, labels=()):
+        self.name = name
+        self.country = country
+        self.lat = lat
+        self.lon = lon
+        self.tz_offset = tz_offset  # seconds east of UTC, for local "tonight"/"tomorrow"
+        self.dt = dt if dt is not None else array("q")
+        self.temp = temp if temp is not None else array("f")
+        self.pop = pop if pop is not None else array("f")
+        self.precip = precip if precip is not None else array("f")
+        self.wind_speed = wind_speed if wind_speed is not None else array("f")
+        self.humidity = humidity if humidity is not None else array("B")
+        self.conditions = conditions if conditions is not None else array("B")
+        self.labels = tuple(labels)
+
+    @classmethod
+    def from_payload(cls, payload: dict) -> "ForecastSeries":
+        city = payload.get("city", {})
+        coord = city.get("coord", {})
+        series = cls(city.get("name"), city.get("country"), coord.get("lat"), coord.get("lon"), city.get("timezone") or 0)
+        labels = {}
+        for slot in sorted(payload.get("list", []), key=lambda slot: slot.get("dt", 0)):
+            main = slot.get("main", {})
+            if slot.get("dt") is None or main.get("temp") is None:
+                continue
+            description = (slot.get("weather") or [{}])[0].get("description") or ""
+            series.dt.append(slot["dt"])
+            series.temp.append(main["temp"])
+            series.pop.append(slot.get("pop", 0.0))
+            series.precip.append(slot.get("rain", {}).get("3h", 0.0) + slot.get("snow", {}).get("3h", 0.0))
+            series.wind_speed.append(slot.get("wind", {}).get("speed", 0.0))
+            series.humidity.append(min(int(main.get("humidity", 0)), 255))
+            series.conditions.append(labels.setdefault(description, len(labels)))
+        series.labels = tuple(labels)
+        return series
+
+    def window(self, start: int, end: int) -> Optional[ForecastWindow]:
+        lo, hi = bisect_left(self.dt, start), bisect_left(self.dt, end)
+        if lo > 0 and self.dt[lo - 1] + self.SLOT_SECONDS > start:
+            lo -= 1  # the slot already under way at `start`
+        if lo >= hi:
+            return None
+        temp = self.temp[lo:hi]
+        description = Counter(self.conditions[lo:hi]).most_common(1)[0][0]
+        return ForecastWindow(
+            start, end,
+            temp_min=round(min(temp), 1), temp_max=round(max(temp), 1),
+            pop_max=round(max(self.pop[lo:hi]), 2), precip_mm=round(sum(self.precip[lo:hi]), 1),
+            wind_max=round(max(self.wind_speed[lo:hi]), 1),
+            description=self.labels[description] if description < len(self.labels) else "",
+            slots=hi - lo,
+        )
+
+    def to_dict(self) -> dict:
+        return {
+            "name": self.name, "country": self.country, "lat": self.lat, "lon": self.lon, "tz_offset": self.tz_offset,
+            "dt": self.dt.tolist(), "temp": [round(t, 2) for t in self.temp], "pop": [round(p, 2) for p in self.pop],
+            "precip": [round(p, 2) for p in self.precip], "wind_speed": [round(w, 2) for w in self.wind_speed],
+            "humidity": self.humidity.tolist(), "description": [self.labels[c] for c in self.conditions],
+        }
+
+    def __eq__(self, other):
+        return isinstance(other, ForecastSeries) and self.to_dict() == other.to_dict()
+
+    def __repr__(self) -> str:
+        return f"ForecastSeries({self.name!r}, {len(self.dt)} slots)"
+
 
 class WeatherState(TypedDict):
     user_query: str
-    location: str
-    weather_data: Optional[dict]
+    session_id: Optional[str]
+    intent: Optional[Intent]
+    units: Units
+    time_ref: TimeRef
+    location: Optional[Location]
+    coords: Optional[tuple[float, float]]
+    cache_key: Optional[str]
+    weather_data: Optional[WeatherSnapshot | ForecastSeries]  # forecast when time_ref is not "now"
     from_cache: bool
+    cache_tier: Optional[str]
+    stale_age_seconds: Optional[int]  # set when an expired entry is served because upstream is down
     llm: Any
     final_answer: Optional[str]
     error: Optional[str]
-
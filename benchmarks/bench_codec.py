@@ -0,0 +1,54 @@
+"""
+Bytes stored and decode time per weather_cache row: the legacy layout
+(full OpenWeather payload as JSON text, decoded with json.loads and then
+reduced to a snapshot) against each snapshot codec in database.codec.
+
+    python -m benchmarks.bench_codec [rows]
+"""
+import json
+import sys
+import timeit
+from database.codec import CODECS
+from Schema.model import WeatherSnapshot
+
+# A typical /data/2.5/weather response (units=metric).
+SAMPLE_PAYLOAD = {
+    "coord": {"lon": -74.006, "lat": 40.7143},
+    "weather": [{"id": 803, "main": "Clouds", "description": "broken clouds", "icon": "04d"}],
+    "base": "stations",
+    "main": {"temp": 22.37, "feels_like": 22.41, "temp_min": 20.93, "temp_max": 23.88,
+             "pressure": 1015, "humidity": 64, "sea_level": 1015, "grnd_level": 1013},
+    "visibility": 10000,
+    "wind": {"speed": 4.12, "deg": 230, "gust": 6.71},
+    "clouds": {"all": 75},
+    "dt": 1726580400,
+    "sys": {"type": 2, "id": 2039034, "country": "US", "sunrise": 1726569203, "sunset": 1726614085},
+    "timezone": -14400,
+    "id": 5128581,
+    "name": "New York",
+    "cod": 200,
+}
+
+
+def _legacy_decode(blob: str) -> WeatherSnapshot:
+    return WeatherSnapshot.from_payload(json.loads(blob))
+
+
+def run(rows: int = 100_000):
+    snapshot = WeatherSnapshot.from_payload(SAMPLE_PAYLOAD)
+    legacy = json.dumps(SAMPLE_PAYLOAD)
+    results = [("legacy json", len(legacy.encode()), timeit.timeit(lambda: _legacy_decode(legacy), number=rows))]
+    for name, codec in CODECS.items():
+        blob = codec.encode(snapshot)
+        assert codec.decode(blob) == snapshot, name
+        results.append((name, len(blob), timeit.timeit(lambda: codec.decode(blob), number=rows)))
+
+    base_bytes, base_time = results[0][1], results[0][2]
+    print(f"{'layout':<12} {'bytes/row':>10} {'vs legacy':>10} {'decode us':>10} {'vs legacy':>10}")
+    for name, size, seconds in results:
+        per_row = seconds / rows * 1e6
+        print(f"{name:<12} {size:>10} {size / base_bytes:>9.0%} {per_row:>10.2f} {seconds / base_time:>9.0%}")
+
+
+if __name__ == "__main__":
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 100_000)
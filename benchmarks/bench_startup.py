@@ -0,0 +1,57 @@
+"""
+Cold-start cost of one worker: time to import the app, to run the lifespan
+startup (DB init, warm-up), and to serve the first and second /weather
+requests. Each run is a fresh interpreter, as after an autoscaling event.
+Compares WARMUP_ON_STARTUP=0 and =1 using the normal .env configuration.
+
+    python -m benchmarks.bench_startup [runs] [query]
+"""
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+DEFAULT_QUERY = "weather at 40.7128, -74.0060"  # parsed locally: no LLM, no geocode
+
+
+def _child(query: str):
+    started = time.perf_counter()
+    import main
+    from fastapi.testclient import TestClient
+    timings = {"import": time.perf_counter() - started}
+
+    started = time.perf_counter()
+    with TestClient(main.app) as client:
+        timings["startup"] = time.perf_counter() - started
+        for name in ("first_request", "second_request"):
+            started = time.perf_counter()
+            client.post("/weather", json={"user_query": query}).raise_for_status()
+            timings[name] = time.perf_counter() - started
+    print(json.dumps(timings))
+
+
+def _run(warmup: bool, query: str) -> dict:
+    env = {**os.environ, "WARMUP_ON_STARTUP": "1" if warmup else "0", "PREFETCH_ENABLED": "0"}
+    out = subprocess.run(
+        [sys.executable, "-m", "benchmarks.bench_startup", "--child", query],
+        env=env, capture_output=True, text=True, check=True,
+    ).stdout
+    return json.loads(out.strip().splitlines()[-1])
+
+
+def run(runs: int = 5, query: str = DEFAULT_QUERY):
+    print(f"{'warm-up':<8} {'import ms':>10} {'startup ms':>11} {'1st req ms':>11} {'2nd req ms':>11}   (median of {runs})")
+    for warmup in (False, True):
+        samples = [_run(warmup, query) for _ in range(runs)]
+        median = {k: statistics.median(s[k] for s in samples) * 1000 for k in samples[0]}
+        print(f"{'on' if warmup else 'off':<8} {median['import']:>10.0f} {median['startup']:>11.0f} "
+              f"{median['first_request']:>11.0f} {median['second_request']:>11.0f}")
+
+
+if __name__ == "__main__":
+    if sys.argv[1:2] == ["--child"]:
+        _child(sys.argv[2])
+    else:
+        run(int(sys.argv[1]) if len(sys.argv) > 1 else 5, sys.argv[2] if len(sys.argv) > 2 else DEFAULT_QUERY)
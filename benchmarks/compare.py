@@ -0,0 +1,53 @@
+"""
+Compare two loadtest reports (e.g. from two commits) and flag regressions.
+
+    python -m benchmarks.compare base.json new.json [--threshold 10]
+
+Exits non-zero if throughput drops, or overall or any node's p95/p99
+rises, by more than --threshold percent.
+"""
+import argparse
+import json
+import sys
+
+
+def _change(base: float, new: float) -> float:
+    return (new - base) / base * 100 if base else 0.0
+
+
+def compare(base: dict, new: dict, threshold: float) -> list[str]:
+    rows, regressions = [], []
+
+    def row(name, base_value, new_value, higher_is_worse=True):
+        change = _change(base_value, new_value)
+        worse = change > threshold if higher_is_worse else change < -threshold
+        rows.append(f"{name:<28} {base_value:>10.2f} {new_value:>10.2f} {change:>+8.1f}%{'  <-- regression' if worse else ''}")
+        if worse:
+            regressions.append(name)
+
+    row("throughput_rps", base["throughput_rps"], new["throughput_rps"], higher_is_worse=False)
+    sections = [("overall", base["overall"], new["overall"])]
+    sections += [(node, base["nodes"][node], new["nodes"][node]) for node in sorted(set(base["nodes"]) & set(new["nodes"]))]
+    for name, b, n in sections:
+        for stat in ("p50_ms", "p95_ms", "p99_ms"):
+            row(f"{name}.{stat}", b[stat], n[stat])
+
+    print(f"{'metric':<28} {base.get('commit') or 'base':>10} {new.get('commit') or 'new':>10} {'change':>9}")
+    print("\n".join(rows))
+    # p50 is reported but only tails and throughput gate the exit code
+    return [name for name in regressions if not name.endswith("p50_ms")]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("base")
+    parser.add_argument("new")
+    parser.add_argument("--threshold", type=float, default=10.0, help="percent")
+    args = parser.parse_args()
+    with open(args.base) as f:
+        base = json.load(f)
+    with open(args.new) as f:
+        new = json.load(f)
+    if base.get("config") != new.get("config"):
+        print("warning: reports were produced with different configurations", file=sys.stderr)
+    sys.exit(1 if compare(base, new, args.threshold) else 0)
@@ -0,0 +1,164 @@
+"""
+Offline load test: runs the FastAPI app against a stub OpenWeather server,
+a fake LLM and SQLite (or any DATABASE_URL, e.g. a local Postgres), then
+drives it at a fixed concurrency with a chosen cache-hit / LLM mix.
+
+Reports throughput and p50/p95/p99 overall and per graph node as JSON
+(loadtest-<commit>.json by default) so runs on different commits can be
+compared with benchmarks/compare.py. A short summary goes to stderr.
+
+    python -m benchmarks.loadtest --requests 2000 --concurrency 32 --hit-ratio 0.8 --llm-ratio 0.3
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=1000, help="measured requests")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--hit-ratio", type=float, default=0.8, help="share of requests for already-cached locations")
+    parser.add_argument("--llm-ratio", type=float, default=0.3, help="share of queries only the LLM can extract")
+    parser.add_argument("--hot-keys", type=int, default=50, help="distinct cached locations the hits are spread over")
+    parser.add_argument("--llm-latency-ms", type=float, default=300)
+    parser.add_argument("--upstream-latency-ms", type=float, default=80)
+    parser.add_argument("--endpoint", choices=["weather", "stream"], default="weather")
+    parser.add_argument("--database-url", default=None, help="default: a fresh SQLite file")
+    parser.add_argument("--log-mode", choices=["dev", "prod", "off"], default="prod",
+                        help="utils.logger mode; compare against 'off' to measure logging overhead")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", default=None, help="JSON report path (default: loadtest-<commit>.json)")
+    return parser.parse_args(argv)
+
+
+def _git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _query(rng: random.Random, needs_llm: bool, n: int) -> str:
+    if needs_llm:
+        return f"how's the weather near Benchtown {n}"
+    return f"weather at {rng.uniform(-60, 60):.3f}, {rng.uniform(-170, 170):.3f}"
+
+
+def build_workload(args) -> tuple[list[str], list[str]]:
+    """(hot queries to pre-warm, measured queries)."""
+    rng = random.Random(args.seed)
+    hot = [_query(rng, rng.random() < args.llm_ratio, n) for n in range(args.hot_keys)]
+    measured = []
+    for i in range(args.requests):
+        if rng.random() < args.hit_ratio:
+            measured.append(rng.choice(hot))
+        else:
+            measured.append(_query(rng, rng.random() < args.llm_ratio, args.hot_keys + i))
+    return hot, measured
+
+
+async def _drive(base_url: str, endpoint: str, queries: list[str], concurrency: int):
+    import httpx
+
+    path = "/weather" if endpoint == "weather" else "/weather/stream"
+    latencies, errors = [], 0
+    pending = iter(queries)
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+
+    async with httpx.AsyncClient(base_url=base_url, timeout=60, limits=limits) as client:
+        async def worker():
+            nonlocal errors
+            for query in pending:
+                started = time.perf_counter()
+                try:
+                    response = await client.post(path, json={"user_query": query})
+                    response.raise_for_status()
+                    latencies.append(time.perf_counter() - started)
+                except httpx.HTTPError:
+                    errors += 1
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+    return latencies, errors, elapsed
+
+
+def run(args) -> dict:
+    from benchmarks.stubs import BackgroundServer, FakeLLM, build_openweather_stub
+
+    workdir = tempfile.mkdtemp(prefix="weather-bench-")
+    stub_app = build_openweather_stub(args.upstream_latency_ms / 1000)
+    with BackgroundServer(stub_app) as stub:
+        # must be set before the app modules read their configuration
+        os.environ.update({
+            "OPENWEATHER_BASE_URL": stub.url,
+            "OPENWEATHER_API_KEY": "bench",
+            "DATABASE_URL": args.database_url or f"sqlite:///{workdir}/bench.db",
+            "EXTRACTION_CACHE_PATH": f"{workdir}/extraction_cache.json",
+            "PREFETCH_ENABLED": "0",
+            "WARMUP_ON_STARTUP": "0",
+            "LOG_MODE": args.log_mode,
+        })
+        # measure the app, not the production quota (unless asked to)
+        os.environ.setdefault("OPENWEATHER_CALLS_PER_MINUTE", "1000000")
+        os.environ.setdefault("LLM_CALLS_PER_MINUTE", "1000000")
+        import main
+        from utils.LLM_init import set_llm
+        from utils.latency import node_latency, summarize
+        from orchestrator.tiered_cache import weather_cache
+        from tools.geocode_cache import geocode_cache
+        from tools.extraction_cache import extraction_cache
+
+        set_llm(FakeLLM(sleep=args.llm_latency_ms / 1000))
+        hot, measured = build_workload(args)
+
+        with BackgroundServer(main.app) as app:
+            asyncio.run(_drive(app.url, args.endpoint, hot, min(args.concurrency, len(hot) or 1)))
+            node_latency.reset()
+            upstream_before = dict(stub_app.state.calls)
+            latencies, errors, elapsed = asyncio.run(_drive(app.url, args.endpoint, measured, args.concurrency))
+            upstream = {k: v - upstream_before[k] for k, v in stub_app.state.calls.items()}
+
+        return {
+            "commit": _git_commit(),
+            "config": {k: v for k, v in vars(args).items() if k != "output"},
+            "elapsed_s": elapsed,
+            "throughput_rps": len(latencies) / elapsed if elapsed else 0.0,
+            "errors": errors,
+            "overall": summarize(latencies),
+            "nodes": node_latency.summary(),
+            "upstream_calls": upstream,
+            "caches": {
+                "l1": weather_cache.l1.stats(),
+                "geocode": geocode_cache.stats(),
+                "extraction": extraction_cache.stats(),
+            },
+        }
+
+
+def _print_summary(report: dict):
+    out = sys.stderr
+    overall = report["overall"]
+    print(f"{report['throughput_rps']:.1f} req/s, {report['errors']} errors, "
+          f"p50 {overall['p50_ms']:.1f} / p95 {overall['p95_ms']:.1f} / p99 {overall['p99_ms']:.1f} ms", file=out)
+    for node, stats in sorted(report["nodes"].items()):
+        print(f"  {node:<18} n={stats['count']:<6} p50 {stats['p50_ms']:8.2f}  p95 {stats['p95_ms']:8.2f}  "
+              f"p99 {stats['p99_ms']:8.2f} ms", file=out)
+    print(f"  upstream calls: {report['upstream_calls']}", file=out)
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    report = run(args)
+    _print_summary(report)
+    output = args.output or f"loadtest-{report['commit'] or 'local'}.json"
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2, default=str)
+    print(f"wrote {output}", file=sys.stderr)
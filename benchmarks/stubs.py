@@ -0,0 +1,139 @@
+"""
+Local stand-ins for the service's upstreams, for offline benchmarks:
+a stub OpenWeather server (geocoding, current weather, forecast) and a fake chat
+model with configurable latency.
+"""
+import asyncio
+import hashlib
+import re
+import socket
+import threading
+import time
+import uvicorn
+from fastapi import FastAPI
+from langchain_core.language_models.fake_chat_models import FakeListChatModel
+from langchain_core.runnables import RunnableLambda
+from Schema.model import QueryExtraction
+
+
+def _coords_for(name: str) -> tuple[float, float]:
+    # stable pseudo-random coordinates per place name
+    digest = hashlib.sha1(name.lower().encode()).digest()
+    lat = int.from_bytes(digest[:4], "big") / 2**32 * 140 - 70
+    lon = int.from_bytes(digest[4:8], "big") / 2**32 * 360 - 180
+    return round(lat, 4), round(lon, 4)
+
+
+def build_openweather_stub(latency: float = 0.05) -> FastAPI:
+    """Same paths and response shapes as api.openweathermap.org; `latency` seconds per call."""
+    app = FastAPI()
+    app.state.calls = {"direct": 0, "zip": 0, "weather": 0, "forecast": 0}
+
+    @app.get("/geo/1.0/direct")
+    async def direct(q: str):
+        app.state.calls["direct"] += 1
+        await asyncio.sleep(latency)
+        lat, lon = _coords_for(q)
+        return [{"name": q, "lat": lat, "lon": lon, "country": "XX"}]
+
+    @app.get("/geo/1.0/zip")
+    async def zip_code(zip: str):
+        app.state.calls["zip"] += 1
+        await asyncio.sleep(latency)
+        lat, lon = _coords_for(zip)
+        return {"zip": zip, "name": zip, "lat": lat, "lon": lon, "country": "XX"}
+
+    @app.get("/data/2.5/weather")
+    async def weather(lat: float, lon: float):
+        app.state.calls["weather"] += 1
+        await asyncio.sleep(latency)
+        return {
+            "coord": {"lon": lon, "lat": lat},
+            "weather": [{"id": 803, "main": "Clouds", "description": "broken clouds", "icon": "04d"}],
+            "main": {"temp": 21.5, "feels_like": 21.4, "pressure": 1015, "humidity": 64},
+            "wind": {"speed": 4.1, "deg": 230},
+            "dt": int(time.time()),
+            "sys": {"country": "XX"},
+            "name": f"Stub {lat:.2f},{lon:.2f}",
+            "cod": 200,
+        }
+
+    @app.get("/data/2.5/forecast")
+    async def forecast(lat: float, lon: float):
+        app.state.calls["forecast"] += 1
+        await asyncio.sleep(latency)
+        start = int(time.time()) // 10800 * 10800
+        return {
+            "cod": "200",
+            "cnt": 40,
+            "list": [
+                {
+                    "dt": start + i * 10800,
+                    "main": {"temp": 15 + 5 * ((i % 8) / 4 - 1), "humidity": 60 + i % 20},
+                    "weather": [{"id": 500, "main": "Rain", "description": "light rain"}] if i % 6 == 0
+                    else [{"id": 800, "main": "Clear", "description": "clear sky"}],
+                    "wind": {"speed": 2 + i % 5},
+                    "pop": 0.6 if i % 6 == 0 else 0.1,
+                    **({"rain": {"3h": 0.8}} if i % 6 == 0 else {}),
+                }
+                for i in range(40)
+            ],
+            "city": {"name": f"Stub {lat:.2f},{lon:.2f}", "coord": {"lat": lat, "lon": lon}, "country": "XX", "timezone": 0},
+        }
+
+    return app
+
+
+class FakeLLM(FakeListChatModel):
+    """
+    Chat model that answers after `sleep` seconds without a network call.
+    Structured extraction treats "... near <Place>" as a weather query for
+    <Place>, anything else as smalltalk.
+    """
+    responses: list = ["It's mild and cloudy right now."]
+
+    def with_structured_output(self, schema, **kwargs):
+        def extract(prompt) -> QueryExtraction:
+            match = re.search(r'Query: "(.*)"', prompt.to_string())
+            place = re.search(r"\bnear (.+)$", match.group(1) if match else "")
+            if not place:
+                return QueryExtraction(intent="smalltalk")
+            return QueryExtraction(intent="weather", location=place.group(1).strip(" ?"), location_type="name")
+
+        async def aextract(prompt) -> QueryExtraction:
+            await asyncio.sleep(self.sleep or 0)
+            return extract(prompt)
+
+        def sync_extract(prompt) -> QueryExtraction:
+            time.sleep(self.sleep or 0)
+            return extract(prompt)
+
+        return RunnableLambda(sync_extract, afunc=aextract)
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+class BackgroundServer:
+    """Runs an ASGI app with uvicorn on a daemon thread (its own event loop)."""
+
+    def __init__(self, app, port: int | None = None):
+        self.port = port or free_port()
+        self.url = f"http://127.0.0.1:{self.port}"
+        self._server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=self.port, log_level="warning"))
+        self._thread = threading.Thread(target=self._server.run, daemon=True)
+
+    def __enter__(self):
+        self._thread.start()
+        while not self._server.started:
+            if not self._thread.is_alive():
+                raise RuntimeError(f"server on port {self.port} failed to start")
+            time.sleep(0.01)
+        return self
+
+    def __exit__(self, *exc):
+        self._server.should_exit = True
+        self._thread.join()
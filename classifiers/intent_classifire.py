@@ -1,25 +1,102 @@
-from langchain.prompts import PromptTemplate
-from langchain_core.output_parsers import StrOutputParser
-from langchain.chains import LLMChain
+import re
+from langchain.prompts import ChatPromptTemplate
+from Schema.model import QueryExtraction
 
-def build_intent_classifier(llm):
+EXTRACTION_PROMPT = ChatPromptTemplate.from_template(
+    """
+    You classify and extract queries for a weather assistant, in one step.
+
+    Query: "{query}"
+
+    - intent: "weather" for anything about weather, temperature, rain, wind or
+      forecasts; "smalltalk" for greetings and chit-chat; "other" otherwise.
+    - location: the single most relevant location for a weather lookup.
+      Coordinates as "lat,lon" (convert DMS to decimal), postal codes as-is,
+      places as a clean city/region name without words like "city of", "near"
+      or "in". For a landmark, give the city it is in. For a country, give it
+      only if nothing more specific is present. Null if there is none or the
+      locations are ambiguous or conflicting.
+    - location_type: "coords", "zip" or "name" for the location above.
+    - units: "imperial" only if the user asks for Fahrenheit or mph.
+    - time_ref: "now" unless the user asks about today, tonight, tomorrow, the
+      weekend or later.
+    """
+)
+
+# A prompt | structured-output chain per LLM instance, built on first use
+# (at startup via warm-up) instead of per request.
+_extractors = {}
+
+
+def get_query_extractor(llm):
+    """Chain that returns a QueryExtraction from {"query": ...} in one LLM call."""
+    entry = _extractors.get(id(llm))
+    if entry is None or entry[0] is not llm:
+        entry = (llm, EXTRACTION_PROMPT | llm.with_structured_output(QueryExtraction))
+        _extractors[id(llm)] = entry
+    return entry[1]
+
+
+def classify_intent(query: str, llm) -> str:
     """
     Classifies user query intent.
     Returns: "weather" | "smalltalk" | "other"
     """
-    prompt = """
-    You are an intent classifier.
-    Decide the intent of this query: "{query}".
-    Valid intents: weather, smalltalk, other.
-    Respond with only one word, exactly matching one of the valid intents.
-    Do not explain, repeat, or add anything else.
-    If unsure, respond with "other".
-    """
-    prompt = PromptTemplate.from_template(prompt)
-    chain = LLMChain(llm=llm, prompt=prompt, output_parser=StrOutputParser())
-    return chain
+    return get_query_extractor(llm).invoke({"query": query}).intent
 
-def classify_intent(query: str, llm) -> str:
-    chain = build_intent_classifier(llm)
-    intent = chain.run({"query": query})
-    return intent.strip().lower()
+
+# Cheap signals for queries that never reach the LLM (parsed locally or
+# answered from the extraction cache).
+_IMPERIAL = re.compile(r"\b(fahrenheit|imperial|mph)\b|°\s*f\b", re.IGNORECASE)
+_TIME_REFS = (
+    ("tonight", re.compile(r"\btonight\b", re.IGNORECASE)),
+    ("tomorrow", re.compile(r"\btomorrow\b", re.IGNORECASE)),
+    ("weekend", re.compile(r"\bweekend\b", re.IGNORECASE)),
+    ("later", re.compile(r"\b(later|next week|in \d+ (hours?|days?))\b", re.IGNORECASE)),
+    ("today", re.compile(r"\btoday\b", re.IGNORECASE)),
+)
+
+
+def local_units(query: str) -> str:
+    return "imperial" if _IMPERIAL.search(query) else "metric"
+
+
+def local_time_ref(query: str) -> str:
+    for time_ref, pattern in _TIME_REFS:
+        if pattern.search(query):
+            return time_ref
+    return "now"
+
+
+# Follow-ups ("and tomorrow?", "what about humidity there?") refer back to
+# the session's last location instead of naming a new one: they name it
+# ("same place"), or consist only of weather/time words and filler, where
+# "there"/"here" count as filler so "hello there" stays smalltalk. A query
+# with "in/at/for/near <other word>" names a new place.
+_POINTS_BACK = re.compile(r"\b(same (place|city|location)|that (place|city))\b", re.IGNORECASE)
+_PLACE_PHRASE = re.compile(r"\b(?:in|at|for|near)\s+([a-z]+)", re.IGNORECASE)
+_FOLLOW_UP_TOPICS = frozenset("""
+    weather temperature temp humidity humid wind windy rain raining rainy snow snowing sunny cloudy clouds
+    forecast hot cold warm chilly outside fahrenheit celsius imperial metric mph
+    max min maximum minimum high low precipitation chance
+    now today tonight tomorrow later morning afternoon evening weekend week hours days
+""".split())
+_FOLLOW_UP_FILLER = frozenset("""
+    and what whats about how hows is it its s the a be will going to then this next in also same like feel feels
+    there here any
+""".split())
+
+
+def is_follow_up(query: str) -> bool:
+    """True if `query` asks about the previous location rather than naming one."""
+    for word in _PLACE_PHRASE.findall(query):
+        word = word.lower()
+        if word not in _FOLLOW_UP_TOPICS and word not in _FOLLOW_UP_FILLER:
+            return False
+    if _POINTS_BACK.search(query):
+        return True
+    words = re.findall(r"[a-z]+", query.lower())
+    return (
+        any(word in _FOLLOW_UP_TOPICS for word in words)
+        and all(word in _FOLLOW_UP_TOPICS or word in _FOLLOW_UP_FILLER for word in words)
+    )
@@ -1,43 +1,172 @@
 import json
 from datetime import datetime
-from sqlalchemy import text
-from database.db import engine
+from sqlalchemy import text, bindparam
+from database.db import get_engine
+from database.codec import codec_for, stored_codec
+from Schema.model import WeatherSnapshot
+from utils.metrics import instrumented
 
 
+def _row_snapshot(row) -> WeatherSnapshot:
+    """Decode a weather_cache row; legacy rows only have the JSON `data` column."""
+    raw = json.loads(row.data) if isinstance(row.data, str) else row.data
+    if row.snapshot is None:
+        return WeatherSnapshot.from_payload(raw or {}, keep_raw=raw is not None)
+    snapshot = stored_codec(row.codec).decode(bytes(row.snapshot))
+    if raw is not None:
+        snapshot.raw = raw
+    return snapshot
+
+
+def _row_params(snapshot: WeatherSnapshot, codec=None) -> dict:
+    codec = codec or codec_for(snapshot)
+    raw = getattr(snapshot, "raw", None)
+    return {
+        "data": json.dumps(raw) if raw is not None else None,
+        "snapshot": codec.encode(snapshot),
+        "codec": codec.name,
+    }
+
+
+@instrumented("db")
 def get_weather_cache(location: str):
     """
     Fetch cached weather data for a given location from DB.
-    Returns dict with { "data": ..., "timestamp": ... } or None.
+    Returns dict with { "data": WeatherSnapshot, "timestamp": ... } or None.
+    """
+    with get_engine().begin() as conn:
+        result = conn.execute(
+            text("SELECT data, snapshot, codec, timestamp FROM weather_cache WHERE location = :location"),
+            {"location": location},
+        ).fetchone()
+
+        if result:
+            return {"data": _row_snapshot(result), "timestamp": result.timestamp}
+        return None
+
+
+@instrumented("db")
+def save_weather_cache(location: str, data: WeatherSnapshot):
+    """
+    Save a weather snapshot into cache with UPSERT (Postgres ON CONFLICT).
+    """
+    with get_engine().begin() as conn:
+        conn.execute(
+            text("""
+                INSERT INTO weather_cache (location, data, snapshot, codec, timestamp)
+                VALUES (:location, :data, :snapshot, :codec, :timestamp)
+                ON CONFLICT (location)
+                DO UPDATE SET data = excluded.data, snapshot = excluded.snapshot,
+                              codec = excluded.codec, timestamp = excluded.timestamp
+            """),
+            {"location": location, **_row_params(data), "timestamp": datetime.now()},
+        )
+
+
+
+@instrumented("db")
+def get_weather_cache_many(locations: list[str]) -> dict:
+    """
+    Fetch cached weather for many locations in one query.
+    Returns { location: { "data": ..., "timestamp": ... } } for the rows found.
+    """
+    if not locations:
+        return {}
+    with get_engine().begin() as conn:
+        rows = conn.execute(
+            text("SELECT location, data, snapshot, codec, timestamp FROM weather_cache WHERE location IN :locations")
+            .bindparams(bindparam("locations", expanding=True)),
+            {"locations": list(locations)},
+        ).fetchall()
+
+    return {row.location: {"data": _row_snapshot(row), "timestamp": row.timestamp} for row in rows}
+
+
+@instrumented("db")
+def get_recent_weather_cache(since: datetime, limit: int) -> dict:
+    """
+    The newest rows written after `since`, for warming L1 at startup.
+    Returns { location: { "data": ..., "timestamp": ... } }.
+    """
+    with get_engine().begin() as conn:
+        rows = conn.execute(
+            text("""
+                SELECT location, data, snapshot, codec, timestamp FROM weather_cache
+                WHERE timestamp >= :since ORDER BY timestamp DESC LIMIT :limit
+            """),
+            {"since": since, "limit": limit},
+        ).fetchall()
+
+    return {row.location: {"data": _row_snapshot(row), "timestamp": row.timestamp} for row in rows}
+
+
+@instrumented("db")
+def save_weather_cache_many(entries: dict, timestamps: dict | None = None):
+    """
+    Save { location: WeatherSnapshot | ForecastSeries } in a single multi-row UPSERT.
+    Keys are unique by construction, which Postgres requires for one
+    INSERT ... ON CONFLICT statement. `timestamps` ({ location: datetime },
+    e.g. when a queued write was fetched) overrides the default of now.
+    """
+    if not entries:
+        return
+    now = datetime.now()
+    values, params = [], {}
+    for i, (location, data) in enumerate(entries.items()):
+        values.append(f"(:location_{i}, :data_{i}, :snapshot_{i}, :codec_{i}, :timestamp_{i})")
+        params[f"location_{i}"] = location
+        for column, value in _row_params(data).items():
+            params[f"{column}_{i}"] = value
+        params[f"timestamp_{i}"] = (timestamps or {}).get(location, now)
+
+    with get_engine().begin() as conn:
+        conn.execute(
+            text(f"""
+                INSERT INTO weather_cache (location, data, snapshot, codec, timestamp)
+                VALUES {", ".join(values)}
+                ON CONFLICT (location)
+                DO UPDATE SET data = excluded.data, snapshot = excluded.snapshot,
+                              codec = excluded.codec, timestamp = excluded.timestamp
+                WHERE excluded.timestamp >= weather_cache.timestamp
+            """),
+            params,
+        )
+
+@instrumented("db")
+def get_geocode_cache(location: str):
+    """
+    Fetch cached coordinates for a normalized location string from DB.
+    Returns dict with { "lat": ..., "lon": ..., "timestamp": ... } or None.
+    lat/lon are both None for a negative (unresolvable) entry.
     """
-    with engine.begin() as conn:
+    with get_engine().begin() as conn:
         result = conn.execute(
-            text("SELECT data, timestamp FROM weather_cache WHERE location = :location"),
+            text("SELECT lat, lon, timestamp FROM geocode_cache WHERE location = :location"),
             {"location": location},
         ).fetchone()
 
         if result:
-            return {
-                "data": json.loads(result.data) if isinstance(result.data, str) else result.data,
-                "timestamp": result.timestamp,
-            }
+            return {"lat": result.lat, "lon": result.lon, "timestamp": result.timestamp}
         return None
 
 
-def save_weather_cache(location: str, data: dict):
+@instrumented("db")
+def save_geocode_cache(location: str, lat: float | None, lon: float | None):
     """
-    Save weather data into cache with UPSERT (Postgres ON CONFLICT).
+    Save resolved coordinates (or a negative entry) with UPSERT.
     """
-    with engine.begin() as conn:
+    with get_engine().begin() as conn:
         conn.execute(
             text("""
-                INSERT INTO weather_cache (location, data, timestamp)
-                VALUES (:location, :data, :timestamp)
+                INSERT INTO geocode_cache (location, lat, lon, timestamp)
+                VALUES (:location, :lat, :lon, :timestamp)
                 ON CONFLICT (location)
-                DO UPDATE SET data = excluded.data, timestamp = excluded.timestamp
+                DO UPDATE SET lat = excluded.lat, lon = excluded.lon, timestamp = excluded.timestamp
             """),
             {
                 "location": location,
-                "data": json.dumps(data),   # store as JSON
+                "lat": lat,
+                "lon": lon,
                 "timestamp": datetime.now(),
             },
         )
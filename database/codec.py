@@ -0,0 +1,197 @@
+"""
+Codecs for the weather_cache.snapshot column. Each row records the codec
+it was written with, so WEATHER_CACHE_CODEC can change without a migration
+and old rows keep decoding. See benchmarks/bench_codec.py for sizes and
+decode times against the legacy full-payload JSON.
+"""
+import json
+import math
+import os
+import struct
+import sys
+import zlib
+from array import array
+from Schema.model import WeatherSnapshot, ForecastSeries
+
+WEATHER_CACHE_CODEC = os.getenv("WEATHER_CACHE_CODEC", "struct")
+# Also keep the full upstream payload (weather_cache.data and in L1).
+WEATHER_CACHE_STORE_RAW = os.getenv("WEATHER_CACHE_STORE_RAW", "0") == "1"
+
+
+def to_snapshot(payload: dict) -> WeatherSnapshot:
+    return WeatherSnapshot.from_payload(payload, keep_raw=WEATHER_CACHE_STORE_RAW)
+
+
+class JsonCodec:
+    name = "json"
+
+    def encode(self, snapshot: WeatherSnapshot) -> bytes:
+        return json.dumps(snapshot.to_dict(), separators=(",", ":")).encode()
+
+    def decode(self, blob: bytes) -> WeatherSnapshot:
+        return WeatherSnapshot(**json.loads(blob))
+
+
+class ZlibJsonCodec(JsonCodec):
+    name = "json+zlib"
+
+    def encode(self, snapshot: WeatherSnapshot) -> bytes:
+        return zlib.compress(super().encode(snapshot))
+
+    def decode(self, blob: bytes) -> WeatherSnapshot:
+        return super().decode(zlib.decompress(blob))
+
+
+class MsgpackCodec:
+    """Positional msgpack array in WeatherSnapshot.FIELDS order (needs `msgpack`)."""
+    name = "msgpack"
+
+    def __init__(self):
+        import msgpack
+        self._msgpack = msgpack
+
+    def encode(self, snapshot: WeatherSnapshot) -> bytes:
+        return self._msgpack.packb([getattr(snapshot, f) for f in WeatherSnapshot.FIELDS])
+
+    def decode(self, blob: bytes) -> WeatherSnapshot:
+        return WeatherSnapshot(*self._msgpack.unpackb(blob))
+
+
+class StructCodec:
+    """
+    Fixed binary layout, no dependencies:
+      version u8 | temp humidity wind_speed lat lon f32 (NaN = missing) |
+      dt i64 (-1 = missing) | name, country, description as u8-length utf-8
+    """
+    name = "struct"
+    VERSION = 1
+    _HEAD = struct.Struct("<B5fq")
+
+    @staticmethod
+    def _f(value):
+        return math.nan if value is None else float(value)
+
+    @staticmethod
+    def _unf(value):
+        return None if math.isnan(value) else round(value, 4)
+
+    def encode(self, snapshot: WeatherSnapshot) -> bytes:
+        parts = [self._HEAD.pack(
+            self.VERSION,
+            self._f(snapshot.temp), self._f(snapshot.humidity), self._f(snapshot.wind_speed),
+            self._f(snapshot.lat), self._f(snapshot.lon),
+            -1 if snapshot.dt is None else int(snapshot.dt),
+        )]
+        for text in (snapshot.name, snapshot.country, snapshot.description):
+            raw = (text or "").encode()[:255]
+            parts.append(bytes((len(raw),)) + raw)
+        return b"".join(parts)
+
+    def decode(self, blob: bytes) -> WeatherSnapshot:
+        _, temp, humidity, wind_speed, lat, lon, dt = self._HEAD.unpack_from(blob)
+        offset = self._HEAD.size
+        texts = []
+        for _ in range(3):
+            length = blob[offset]
+            texts.append(blob[offset + 1:offset + 1 + length].decode() or None)
+            offset += 1 + length
+        humidity = self._unf(humidity)
+        return WeatherSnapshot(
+            name=texts[0], country=texts[1], description=texts[2],
+            temp=self._unf(temp),
+            humidity=int(humidity) if humidity is not None and humidity.is_integer() else humidity,
+            wind_speed=self._unf(wind_speed),
+            dt=None if dt == -1 else dt,
+            lat=self._unf(lat), lon=self._unf(lon),
+        )
+
+
+class ForecastCodec:
+    """
+    ForecastSeries as its raw column buffers, little-endian:
+      version u8 | lat lon f32 | tz_offset i32 | slots u16 |
+      dt i64[n] | temp pop precip wind_speed f32[n] | humidity conditions u8[n] |
+      name, country, then each label as u8-length utf-8
+    """
+    name = "forecast"
+    VERSION = 1
+    _HEAD = struct.Struct("<B2fiH")
+    _COLUMNS = (("dt", "q"), ("temp", "f"), ("pop", "f"), ("precip", "f"), ("wind_speed", "f"),
+                ("humidity", "B"), ("conditions", "B"))
+
+    @staticmethod
+    def _le(column: array) -> bytes:
+        if sys.byteorder == "little":
+            return column.tobytes()
+        swapped = array(column.typecode, column)
+        swapped.byteswap()
+        return swapped.tobytes()
+
+    def encode(self, series: ForecastSeries) -> bytes:
+        parts = [self._HEAD.pack(
+            self.VERSION, StructCodec._f(series.lat), StructCodec._f(series.lon), series.tz_offset or 0, len(series.dt),
+        )]
+        parts += [self._le(getattr(series, column)) for column, _ in self._COLUMNS]
+        parts.append(bytes((len(series.labels),)))
+        for text in (series.name, series.country, *series.labels):
+            raw = (text or "").encode()[:255]
+            parts.append(bytes((len(raw),)) + raw)
+        return b"".join(parts)
+
+    def decode(self, blob: bytes) -> ForecastSeries:
+        _, lat, lon, tz_offset, n = self._HEAD.unpack_from(blob)
+        offset = self._HEAD.size
+        columns = {}
+        for column, typecode in self._COLUMNS:
+            values = array(typecode)
+            size = values.itemsize * n
+            values.frombytes(blob[offset:offset + size])
+            if sys.byteorder != "little":
+                values.byteswap()
+            columns[column] = values
+            offset += size
+        label_count = blob[offset]
+        offset += 1
+        texts = []
+        for _ in range(2 + label_count):
+            length = blob[offset]
+            texts.append(blob[offset + 1:offset + 1 + length].decode())
+            offset += 1 + length
+        return ForecastSeries(
+            name=texts[0] or None, country=texts[1] or None,
+            lat=StructCodec._unf(lat), lon=StructCodec._unf(lon), tz_offset=tz_offset,
+            labels=texts[2:], **columns,
+        )
+
+
+FORECAST_CODEC = ForecastCodec()
+
+
+def _available():
+    # WeatherSnapshot codecs only; FORECAST_CODEC is looked up separately
+    codecs = {c.name: c for c in (JsonCodec(), ZlibJsonCodec(), StructCodec())}
+    try:
+        codecs["msgpack"] = MsgpackCodec()
+    except ImportError:
+        pass
+    return codecs
+
+
+CODECS = _available()
+
+
+def get_codec(name: str = WEATHER_CACHE_CODEC):
+    try:
+        return CODECS[name]
+    except KeyError:
+        raise ValueError(f"Unknown or unavailable weather cache codec: {name}") from None
+
+
+def codec_for(value):
+    """Codec to store `value` with: forecasts have their own, snapshots use WEATHER_CACHE_CODEC."""
+    return FORECAST_CODEC if isinstance(value, ForecastSeries) else get_codec()
+
+
+def stored_codec(name: str):
+    """Codec named by a weather_cache row's `codec` column."""
+    return FORECAST_CODEC if name == FORECAST_CODEC.name else CODECS[name]
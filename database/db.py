@@ -1,4 +1,4 @@
-from sqlalchemy import create_engine, MetaData
+from sqlalchemy import create_engine, MetaData, Table, Column, String, Text, Float, DateTime, LargeBinary, inspect, text
 from sqlalchemy.orm import sessionmaker
 import os
 from dotenv import load_dotenv
@@ -6,14 +6,61 @@ from dotenv import load_dotenv
 load_dotenv()
 
 DATABASE_URL = os.getenv("DATABASE_URL")
+DB_ECHO = os.getenv("DB_ECHO", "0") == "1"
 
-if not DATABASE_URL:
-    raise ValueError(" DATABASE_URL not found in .env file")
-
-engine = create_engine(DATABASE_URL, echo=True, future=True)
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+SessionLocal = sessionmaker(autocommit=False, autoflush=False)
 metadata = MetaData()
 
+_engine = None
+
+
+def get_engine():
+    """Engine (and its pool), created on first use rather than at import."""
+    global _engine
+    if _engine is None:
+        if not DATABASE_URL:
+            raise ValueError(" DATABASE_URL not found in .env file")
+        _engine = create_engine(DATABASE_URL, echo=DB_ECHO, future=True)
+        SessionLocal.configure(bind=_engine)
+    return _engine
+
+
+weather_cache = Table(
+    "weather_cache",
+    metadata,
+    Column("location", String, primary_key=True),
+    # Full OpenWeather payload as JSON; only written when raw storage is on
+    # (WEATHER_CACHE_STORE_RAW=1). Rows from before `snapshot` existed
+    # have only this column and are decoded from it.
+    Column("data", Text, nullable=True),
+    Column("timestamp", DateTime),
+    # WeatherSnapshot encoded with the codec named in `codec` (database.codec)
+    Column("snapshot", LargeBinary, nullable=True),
+    Column("codec", String, nullable=True),
+)
+
+# Resolved location strings -> coordinates. NULL lat/lon marks a string the
+# geocoder could not resolve (negative entry).
+geocode_cache = Table(
+    "geocode_cache",
+    metadata,
+    Column("location", String, primary_key=True),
+    Column("lat", Float, nullable=True),
+    Column("lon", Float, nullable=True),
+    Column("timestamp", DateTime),
+)
+
+def _add_missing_columns(table: Table):
+    """create_all never alters existing tables; add new nullable columns in place."""
+    engine = get_engine()
+    existing = {column["name"] for column in inspect(engine).get_columns(table.name)}
+    with engine.begin() as conn:
+        for column in table.columns:
+            if column.name not in existing:
+                column_type = column.type.compile(dialect=engine.dialect)
+                conn.execute(text(f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}"))
+
 def init_db():
     """Initialize database tables"""
-    metadata.create_all(bind=engine)
+    metadata.create_all(bind=get_engine())
+    _add_missing_columns(weather_cache)
@@ -0,0 +1,106 @@
+import atexit
+import os
+import threading
+from datetime import datetime
+from database.cache import save_weather_cache_many
+from utils.logger import logger
+
+# "sync" writes each fetched result in the request path (default);
+# "write_behind" queues it and lets a background thread flush in bulk.
+CACHE_WRITE_MODE = os.getenv("CACHE_WRITE_MODE", "sync")
+WRITE_BEHIND_BATCH = int(os.getenv("WRITE_BEHIND_BATCH", "100"))
+WRITE_BEHIND_INTERVAL = float(os.getenv("WRITE_BEHIND_INTERVAL_SECONDS", "1.0"))
+
+
+class WriteBehindQueue:
+    """
+    Pending weather_cache writes keyed by location, so repeated writes to
+    one key collapse to the latest before they reach the DB. A daemon
+    thread flushes them as multi-row upserts when `batch_size` keys are
+    pending or every `interval` seconds, whichever comes first. Rows are
+    stamped with when the data was queued (i.e. fetched), not flushed, so
+    a delayed or retried write never makes an entry look fresher.
+    """
+
+    def __init__(self, flush_fn=save_weather_cache_many, batch_size: int = WRITE_BEHIND_BATCH, interval: float = WRITE_BEHIND_INTERVAL):
+        self.flush_fn = flush_fn
+        self.batch_size = batch_size
+        self.interval = interval
+        self.enqueued = 0
+        self.written = 0
+        self.flushes = 0
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stopping = False
+        self._thread = None
+
+    def put(self, location: str, data, fetched_at: datetime | None = None):
+        if self._thread is None:
+            self.start()
+        with self._lock:
+            self._pending[location] = (data, fetched_at or datetime.now())
+            self.enqueued += 1
+            full = len(self._pending) >= self.batch_size
+        if full:
+            self._wake.set()
+
+    def pending(self) -> int:
+        with self._lock:
+            return len(self._pending)
+
+    def flush(self):
+        """Write everything queued so far."""
+        with self._lock:
+            batch, self._pending = self._pending, {}
+        items = list(batch.items())
+        for start in range(0, len(items), self.batch_size):
+            chunk = dict(items[start:start + self.batch_size])
+            try:
+                self.flush_fn(
+                    {key: data for key, (data, _) in chunk.items()},
+                    timestamps={key: fetched_at for key, (_, fetched_at) in chunk.items()},
+                )
+                self.written += len(chunk)
+                self.flushes += 1
+            except Exception as e:
+                logger.error("Write-behind flush of {} rows failed: {}", len(chunk), e)
+                with self._lock:
+                    # keep newer values that arrived while we were writing
+                    for key, entry in chunk.items():
+                        self._pending.setdefault(key, entry)
+
+    def _run(self):
+        while not self._stopping:
+            self._wake.wait(self.interval)
+            self._wake.clear()
+            self.flush()
+
+    def start(self):
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._stopping = False
+            self._thread = threading.Thread(target=self._run, name="weather-cache-writer", daemon=True)
+            self._thread.start()
+        atexit.register(self.stop)
+
+    def stop(self):
+        """Stop the flusher and drain whatever is still pending."""
+        if self._thread is not None:
+            self._stopping = True
+            self._wake.set()
+            self._thread.join()
+            self._thread = None
+        self.flush()
+
+    def stats(self) -> dict:
+        return {
+            "pending": self.pending(),
+            "enqueued": self.enqueued,
+            "written": self.written,
+            "flushes": self.flushes,
+        }
+
+
+write_behind = WriteBehindQueue() if CACHE_WRITE_MODE == "write_behind" else None
@@ -0,0 +1,56 @@
+"""
+Server-sent events for /weather/stream, driven by LangGraph's stream API.
+Event order for a normal request:
+  location -> weather -> token* (LLM formatter only) -> answer -> done
+Non-weather queries get just answer -> done.
+An `error` event replaces the rest when a node fails.
+"""
+import json
+from dataclasses import asdict
+from utils.logger import logger
+
+
+def sse(event: str, payload: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(payload, default=str)}\n\n"
+
+
+def _node_events(node: str, update: dict):
+    if update.get("error"):
+        # format_answer turns the error into final_answer; report it once
+        if node == "format_answer":
+            yield sse("error", {"error": update["error"]})
+        return
+
+    if node == "extract_query" and update.get("location"):
+        yield sse("location", asdict(update["location"]))
+    elif node in ("check_cache", "fetch_from_api") and update.get("weather_data") is not None:
+        # check_cache hit -> weather event; miss (or last-known fallback) -> fetch_from_api emits it
+        if node == "fetch_from_api" and update.get("from_cache") and update.get("stale_age_seconds") is None:
+            return
+        yield sse("weather", {
+            "data": update["weather_data"].to_dict(),
+            "from_cache": update.get("from_cache", False),
+            "cache_tier": update.get("cache_tier"),
+            "stale_age_seconds": update.get("stale_age_seconds"),
+        })
+    elif node in ("format_answer", "off_topic_reply"):
+        yield sse("answer", {"text": update.get("final_answer")})
+
+
+async def stream_weather_events(graph, state):
+    """Yield SSE frames as each graph node finishes and as answer tokens arrive."""
+    try:
+        async for mode, chunk in graph.astream(state, stream_mode=["updates", "messages"]):
+            if mode == "updates":
+                for node, update in chunk.items():
+                    for frame in _node_events(node, update or {}):
+                        yield frame
+            else:
+                message, metadata = chunk
+                # only the answer; extraction tokens are not for the user
+                if metadata.get("langgraph_node") == "format_answer" and message.content:
+                    yield sse("token", {"text": message.content})
+    except Exception as e:
+        logger.error("Streaming request failed: {}", e)
+        yield sse("error", {"error": "Internal error while processing the request."})
+    yield sse("done", {})
@@ -1,142 +1,238 @@
+import asyncio
+from functools import wraps
+import httpx
 from langgraph.graph import StateGraph, END
-from tools.location_resolver import resolve_location
-from database.cache import get_weather_cache, save_weather_cache
-from orchestrator.state_manager import StateManager
-from tools.response_formatter import format_response
-from utils.logger import logger
-from datetime import datetime, timedelta
+from tools.location_resolver import aresolve_query
+from tools.location_parser import parse_location
+from classifiers.intent_classifire import is_follow_up, local_units, local_time_ref
+from tools.weather_api import aget_coordinates, afetch_weather_at, afetch_forecast_at
+from orchestrator.tiered_cache import weather_cache, forecast_cache, FORECAST_PREFIX
+from orchestrator.prefetch import popularity
+from orchestrator.session_store import session_store, SessionContext
+from tools.response_formatter import format_response, aformat_response_llm, format_forecast, stale_notice, RESPONSE_FORMATTER
+from utils.logger import logger, brief
+from utils.singleflight import AsyncSingleFlight
+from utils.geo import spatial_cell
+from utils.helpers import forecast_window
+from utils.latency import node_latency
+from utils.upstream import UpstreamUnavailable
+from database.codec import to_snapshot
 from dotenv import load_dotenv
-from Schema.model import WeatherState
-from utils.LLM_init import llm
-import requests
-import re
+from Schema.model import WeatherState, ForecastSeries
 
 load_dotenv()
 
 
-state_manager = StateManager()
-CACHE_EXPIRY = timedelta(minutes=30)
-API_KEY = "YOUR_OPENWEATHER_API_KEY"  
+weather_flight = AsyncSingleFlight()
+_background_refreshes = set()
 
 
-def get_coordinates(location: str):
-    """Resolve location string to latitude/longitude using OpenWeather Geocoding API."""
-    # Direct geocoding
-    url = "http://api.openweathermap.org/geo/1.0/direct"
-    params = {"q": location, "limit": 1, "appid": API_KEY}
-    response = requests.get(url, params=params)
-    data = response.json()
-    if data:
-        return data[0]["lat"], data[0]["lon"]
+OFF_TOPIC_REPLIES = {
+    "smalltalk": "Hi! I'm a weather assistant. Ask me about the weather anywhere, e.g. \"weather in Paris\".",
+    "other": "I can only help with weather questions. Try something like \"weather in Paris\".",
+}
+UPSTREAM_DOWN_REPLY = "The weather service is temporarily unavailable. Please try again in a minute."
+# What a failed outbound call can raise (after retries, or rejected up front).
+UPSTREAM_ERRORS = (UpstreamUnavailable, httpx.HTTPError)
 
 
-    url_zip = "http://api.openweathermap.org/geo/1.0/zip"
-    params_zip = {"zip": location, "appid": API_KEY}
-    response_zip = requests.get(url_zip, params=params_zip)
-    data_zip = response_zip.json()
-    if "lat" in data_zip and "lon" in data_zip:
-        return data_zip["lat"], data_zip["lon"]
+async def extract_query(state: WeatherState) -> WeatherState:
+    """One structured call (or none) for intent, location, units and time reference."""
+    query = state.get("user_query")
+    context = session_store.get(state.get("session_id"))
+    if context and not parse_location(query) and is_follow_up(query):
+        logger.info("Follow-up query, reusing session location {}", context.location)
+        units = "imperial" if local_units(query) == "imperial" else context.units
+        return {**state, "intent": "weather", "units": units, "time_ref": local_time_ref(query),
+                "location": context.location, "coords": context.coords, "cache_key": context.cache_key}
 
-    match = re.match(r"^\s*([-\d\.]+)\s*,\s*([-\d\.]+)\s*$", location)
-    if match:
-        return float(match.group(1)), float(match.group(2))
+    try:
+        resolved = await aresolve_query(query, state["llm"])
+    except UpstreamUnavailable as e:
+        logger.error("Query extraction skipped: {!r}", e)
+        return {**state, "error": UPSTREAM_DOWN_REPLY}
+    state = {**state, "intent": resolved.intent, "units": resolved.units, "time_ref": resolved.time_ref}
+    if resolved.intent == "weather" and not resolved.location:
+        logger.error("❌ Could not detect a location")
+        return {**state, "error": "Could not detect a location."}
+    return {**state, "location": resolved.location}
 
-    return None, None
+def route_query(state: WeatherState) -> str:
+    if state.get("error"):
+        return "format_answer"
+    if state.get("intent") != "weather":
+        return "off_topic_reply"
+    if state.get("cache_key"):
+        # follow-up: coordinates came from the session
+        return "check_cache"
+    return "geocode_location"
 
-def fetch_weather(location: str):
-    """Fetch current weather data using coordinates."""
-    lat, lon = get_coordinates(location)
+async def off_topic_reply(state: WeatherState) -> WeatherState:
+    """Non-weather intents end here, before any cache, geocode or API work."""
+    return {**state, "final_answer": OFF_TOPIC_REPLIES.get(state.get("intent"), OFF_TOPIC_REPLIES["other"])}
+
+async def geocode_location(state: WeatherState) -> WeatherState:
+    """Name -> coordinates (cached separately), then coordinates -> spatial cache cell."""
+    location = state["location"]
+    try:
+        lat, lon = await aget_coordinates(location)
+    except UPSTREAM_ERRORS as e:
+        logger.error("Geocoding failed for {}: {!r}", location, e)
+        return {**state, "error": UPSTREAM_DOWN_REPLY}
     if lat is None or lon is None:
-        return {"error": f"Could not resolve location: {location}"}
+        logger.error("❌ Could not resolve location: {}", location)
+        return {**state, "error": f"Could not resolve location: {location}"}
 
-    url = "https://api.openweathermap.org/data/2.5/weather"
-    params = {"lat": lat, "lon": lon, "appid": API_KEY, "units": "metric"}
-    response = requests.get(url, params=params)
-    response.raise_for_status()
-    return response.json()
+    cache_key, cell_lat, cell_lon = spatial_cell(lat, lon)
+    return {**state, "coords": (cell_lat, cell_lon), "cache_key": cache_key}
 
-def extract_location(state: WeatherState) -> WeatherState:
-    query = state.get("user_query")
-    location = resolve_location(query, state["llm"])
-    if not location:
-        logger.error("❌ Could not detect a location")
-        return {**state, "error": "Could not detect a location."}
-    return {**state, "location": location}
+def _data_key(state: WeatherState) -> str:
+    """Cache key of what this query needs: current weather, or the cell's forecast for later times."""
+    if state.get("time_ref", "now") == "now":
+        return state["cache_key"]
+    return FORECAST_PREFIX + state["cache_key"]
 
-def check_cache(state: WeatherState) -> WeatherState:
+def _source(cache_key: str):
+    """(cache, fetch, convert) for a cache key."""
+    if cache_key.startswith(FORECAST_PREFIX):
+        return forecast_cache, afetch_forecast_at, ForecastSeries.from_payload
+    return weather_cache, afetch_weather_at, to_snapshot
+
+async def check_cache(state: WeatherState) -> WeatherState:
     location = state["location"]
+    key = _data_key(state)
+    cache = _source(key)[0]
+    if cache is weather_cache:
+        # prefetch only keeps current weather warm
+        popularity.record(key, state["coords"])
+
+    hit = await cache.alookup(key)
+    if hit is None:
+        return {**state, "weather_data": None, "from_cache": False, "cache_tier": None}
+
+    if hit.stale:
+        # Serve what we have now; refresh in the background (single-flighted).
+        logger.info("♻️ Serving stale {cache_tier} cache, refreshing {}", location, cache_tier=hit.tier)
+        refresh_in_background(key, state["coords"])
+    elif hit.tier == "l1":
+        logger.info("🔄 Using in-memory cache", cache_tier=hit.tier)
+    else:
+        logger.info("📦 Using DB cache", cache_tier=hit.tier)
+    return {**state, "weather_data": hit.data, "from_cache": True, "cache_tier": hit.tier}
+
+async def refresh(cache_key, coords):
+    """Fetch and store one cell now (single-flighted); used by revalidation and prefetch."""
+    return await weather_flight.do(cache_key, _fetch_and_store, cache_key, coords)
+
+def refresh_in_background(cache_key, coords):
+    task = asyncio.create_task(refresh(cache_key, coords))
+    _background_refreshes.add(task)
+    task.add_done_callback(_refresh_done)
 
-    # In-memory cache
-    if state_manager.has_recent_weather(location, CACHE_EXPIRY):
-        logger.info("🔄 Using in-memory cache")
-        data = state_manager.get_weather(location)
-        return {**state, "weather_data": data, "from_cache": True}
-
-    # DB cache
-    cached = get_weather_cache(location)
-    if cached:
-        ts = cached["timestamp"]
-        if isinstance(ts, str):
-            try:
-                ts = datetime.fromisoformat(ts)
-            except ValueError:
-                ts = datetime.strptime(ts, "%Y-%m-%d %H:%M:%S")
-        if datetime.now() - ts < CACHE_EXPIRY:
-            logger.info("📦 Using DB cache")
-            return {**state, "weather_data": cached["data"], "from_cache": True}
-
-    return {**state, "weather_data": None, "from_cache": False}
-
-def fetch_from_api(state: WeatherState) -> WeatherState:
+def _refresh_done(task: asyncio.Task):
+    _background_refreshes.discard(task)
+    if not task.cancelled() and task.exception():
+        logger.warning("Background refresh failed: {}", task.exception())
+
+async def fetch_from_api(state: WeatherState) -> WeatherState:
     if state["weather_data"] is not None:
         return state
-    
-    location = state["location"]
-    logger.info(f" Fetching weather from API for {location}")
-    data = fetch_weather(location)
-    
-    if "error" in data:
-        logger.error(f" {data['error']}")
-        return {**state, "error": data["error"]}
-
-    save_weather_cache(location, data)
-    state_manager.update_weather(location, data)
-    logger.info(f" Weather data fetched from API: {data}")
+
+    cache_key = _data_key(state)
+    logger.info("🌍 Fetching weather from API for {} ({})", state["location"], cache_key)
+    # Concurrent misses for the same cell share one fetch and one upsert.
+    try:
+        data = await weather_flight.do(cache_key, _fetch_and_store, cache_key, state["coords"])
+    except UPSTREAM_ERRORS as e:
+        return await _serve_last_known(state, e)
     return {**state, "weather_data": data}
 
-def format_answer(state: WeatherState) -> WeatherState:
+async def _serve_last_known(state: WeatherState, error: Exception) -> WeatherState:
+    """Upstream is down: answer from the newest cached entry, however expired, with its age."""
+    key = _data_key(state)
+    hit = await _source(key)[0].alast_known(key)
+    if hit is None:
+        logger.error("Weather fetch failed with nothing cached for {}: {!r}", key, error)
+        return {**state, "error": UPSTREAM_DOWN_REPLY}
+    age = int(hit.age.total_seconds())
+    logger.warning("Weather fetch failed ({!r}), serving {}s old {} entry", error, age, hit.tier)
+    return {**state, "weather_data": hit.data, "from_cache": True, "cache_tier": hit.tier, "stale_age_seconds": age}
+
+async def fetch_cell(cache_key, coords):
+    """Fetch and convert one cache key without storing it (the caller stores, e.g. in bulk)."""
+    _, fetch, convert = _source(cache_key)
+    return convert(await fetch(*coords))
+
+async def _fetch_and_store(cache_key, coords):
+    data = await fetch_cell(cache_key, coords)
+    await _source(cache_key)[0].astore(cache_key, data)
+    logger.debug("✅ Weather data fetched from API: {}", data)
+    return data
+
+async def format_answer(state: WeatherState) -> WeatherState:
     if state.get("error"):
-        logger.error(f" Error in state: {state['error']}")
+        logger.error(" Error in state: {}", state["error"])
         return {**state, "final_answer": state["error"]}
 
     query = state["user_query"]
     data = state["weather_data"]
-    logger.info(f" Formatting answer with data: {data}")
+    logger.debug(" Formatting answer with data: {}", data)
 
     if not data:
         return {**state, "final_answer": "No weather data available."}
 
+    session_store.remember(state.get("session_id"), SessionContext(
+        state["location"], state["coords"], state["cache_key"], state.get("units") or "metric",
+    ))
+
     llm_inst = state["llm"]
-    answer = format_response(query, data, llm_inst)
-    logger.info(f"LLM answer: {answer}")
+    units = state.get("units") or "metric"
+    if isinstance(data, ForecastSeries):
+        # one cached forecast answers every time window; aggregate the slice asked about
+        time_ref = state.get("time_ref") or "later"
+        window = data.window(*forecast_window(time_ref, data.tz_offset))
+        answer = format_forecast(data, window, units, time_ref) if window else "No forecast is available for that time yet."
+    elif RESPONSE_FORMATTER == "llm":
+        answer = await aformat_response_llm(query, data, llm_inst, units)
+    else:
+        answer = format_response(query, data, llm_inst, units)
+    if answer and state.get("stale_age_seconds") is not None:
+        answer = f"{answer} {stale_notice(state['stale_age_seconds'])}"
+    logger.opt(lazy=True).debug("LLM answer: {}", lambda: brief(answer))
 
-    return {**state, "final_answer": answer or "couldn’t generate a response."}
+    return {**state, "final_answer": answer or "I couldn’t generate a response."}
 
 # --------------------------
 # GRAPH DEFINITION
 # --------------------------
+def _node(name, fn):
+    """Time the node and tag every log line it emits with its name."""
+    @wraps(fn)
+    async def wrapper(state):
+        with logger.contextualize(node=name):
+            return await fn(state)
+    return node_latency.timed(name, wrapper)
+
 def build_weather_graph():
     workflow = StateGraph(WeatherState)
 
-    workflow.add_node("extract_location", extract_location)
-    workflow.add_node("check_cache", check_cache)
-    workflow.add_node("fetch_from_api", fetch_from_api)
-    workflow.add_node("format_answer", format_answer)
+    workflow.add_node("extract_query", _node("extract_query", extract_query))
+    workflow.add_node("off_topic_reply", _node("off_topic_reply", off_topic_reply))
+    workflow.add_node("geocode_location", _node("geocode_location", geocode_location))
+    workflow.add_node("check_cache", _node("check_cache", check_cache))
+    workflow.add_node("fetch_from_api", _node("fetch_from_api", fetch_from_api))
+    workflow.add_node("format_answer", _node("format_answer", format_answer))
 
-    workflow.set_entry_point("extract_location")
+    workflow.set_entry_point("extract_query")
 
     workflow.add_conditional_edges(
-        "extract_location",
+        "extract_query",
+        route_query,
+        {"format_answer": "format_answer", "off_topic_reply": "off_topic_reply",
+         "geocode_location": "geocode_location", "check_cache": "check_cache"}
+    )
+    workflow.add_conditional_edges(
+        "geocode_location",
         lambda state: bool(state.get("error")),
         {True: "format_answer", False: "check_cache"}
     )
@@ -144,5 +240,17 @@ def build_weather_graph():
     workflow.add_edge("check_cache", "fetch_from_api")
     workflow.add_edge("fetch_from_api", "format_answer")
     workflow.add_edge("format_answer", END)
+    workflow.add_edge("off_topic_reply", END)
 
     return workflow.compile()
+
+
+_graph = None
+
+
+def get_weather_graph():
+    """The compiled graph, built once per process on first use."""
+    global _graph
+    if _graph is None:
+        _graph = build_weather_graph()
+    return _graph
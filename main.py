@@ -1,31 +1,76 @@
-from fastapi import FastAPI
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, HTTPException
+from fastapi.responses import StreamingResponse, Response
 from pydantic import BaseModel
+from typing import Optional
 from fastapi.middleware.cors import CORSMiddleware
-from datetime import datetime, timedelta
 from dotenv import load_dotenv
 from Schema.model import WeatherState
-from utils.LLM_init import llm
-from tools.location_resolver import resolve_location
-from database.cache import get_weather_cache, save_weather_cache
-from orchestrator.state_manager import StateManager
-from tools.response_formatter import format_response
-from langgraph.graph import StateGraph, END
-import requests
-import re
-import os
-import logging
+from utils.LLM_init import get_llm
+from utils.http_client import close_clients
+from database.db import init_db
+from database.write_behind import write_behind
+from graph.weather_graph import get_weather_graph, refresh, weather_flight
+from graph.streaming import stream_weather_events
+from tools.extraction_cache import extraction_cache
+from tools.geocode_cache import geocode_cache
+from tools.gazetteer import gazetteer
+from tools.location_resolver import failed_extractions
+from orchestrator.batch import run_batch, BATCH_MAX_ITEMS
+from orchestrator.prefetch import PrefetchScheduler, popularity, PREFETCH_ENABLED
+from orchestrator.tiered_cache import weather_cache
+from orchestrator.ttl_policy import ttl_policy
+from orchestrator.session_store import session_store
+from orchestrator.warmup import warm_up, WARMUP_ON_STARTUP
+from utils.metrics import REGISTRY, CONTENT_TYPE, MetricsMiddleware
+from utils.upstream import openweather, llm_upstream
+from utils.logger import logger, intercept_stdlib_logging, RequestLogMiddleware
+import asyncio
 
 load_dotenv()
 
 
-API_KEY = os.getenv("OPENWEATHER_API_KEY")
-CACHE_EXPIRY = timedelta(minutes=30)
-state_manager = StateManager()
-
-logging.basicConfig(level=logging.INFO)
-logger = logging.getLogger(__name__)
-
-app = FastAPI()
+intercept_stdlib_logging()
+
+prefetcher = PrefetchScheduler(popularity, weather_cache, refresh)
+
+# Component stats are read only when /metrics is scraped.
+REGISTRY.register_stats("weather_l1_cache", "In-process weather cache", weather_cache.l1.stats)
+REGISTRY.register_stats("weather_geocode_cache", "Geocode cache", geocode_cache.stats)
+REGISTRY.register_stats("weather_gazetteer", "Offline gazetteer", gazetteer.stats)
+REGISTRY.register_stats("weather_extraction_cache", "Extraction cache", extraction_cache.stats)
+REGISTRY.register_stats("weather_failed_extractions", "Negative extraction cache", failed_extractions.stats)
+REGISTRY.register_stats("weather_fetches", "Single-flighted weather fetches", lambda: {"in_flight": weather_flight.in_flight()})
+REGISTRY.register_stats("weather_prefetch", "Prefetch scheduler", lambda: {"prefetched": prefetcher.prefetched, "failures": prefetcher.failures})
+REGISTRY.register_stats("weather_sessions", "Session context store", session_store.stats)
+REGISTRY.register_stats("weather_ttl_policy", "Observation-based cache expiry", ttl_policy.stats)
+REGISTRY.register_stats("weather_upstream_openweather", "OpenWeather quota, retries and circuit breaker", openweather.stats)
+REGISTRY.register_stats("weather_upstream_llm", "LLM quota, retries and circuit breaker", llm_upstream.stats)
+if write_behind:
+    REGISTRY.register_stats("weather_write_behind", "Write-behind queue", write_behind.stats)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Heavy clients are created here (or on first use), never at import.
+    await asyncio.to_thread(init_db)
+    if WARMUP_ON_STARTUP:
+        await warm_up()
+    if write_behind:
+        write_behind.start()
+    if PREFETCH_ENABLED:
+        prefetcher.start()
+    yield
+    await prefetcher.stop()
+    if write_behind:
+        await asyncio.to_thread(write_behind.stop)
+    await close_clients()
+    await asyncio.to_thread(extraction_cache.save)
+
+
+app = FastAPI(lifespan=lifespan)
+app.add_middleware(MetricsMiddleware)
+app.add_middleware(RequestLogMiddleware)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],  # change to frontend URL in production
@@ -36,147 +81,70 @@ app.add_middleware(
 
 class Query(BaseModel):
     user_query: str
-
-def get_coordinates(location: str):
-    """Resolve location string to latitude/longitude using OpenWeather Geocoding API."""
-    # Direct geocoding
-    url = "http://api.openweathermap.org/geo/1.0/direct"
-    params = {"q": location, "limit": 1, "appid": API_KEY}
-    response = requests.get(url, params=params)
-    data = response.json()
-    if data:
-        return data[0]["lat"], data[0]["lon"]
-
-
-    url_zip = "http://api.openweathermap.org/geo/1.0/zip"
-    params_zip = {"zip": location, "appid": API_KEY}
-    response_zip = requests.get(url_zip, params=params_zip)
-    data_zip = response_zip.json()
-    if "lat" in data_zip and "lon" in data_zip:
-        return data_zip["lat"], data_zip["lon"]
-
-
-    match = re.match(r"^\s*([-\d\.]+)\s*,\s*([-\d\.]+)\s*$", location)
-    if match:
-        return float(match.group(1)), float(match.group(2))
-
-    return None, None
-
-def fetch_weather(location: str):
-    """Fetch current weather data using coordinates."""
-    lat, lon = get_coordinates(location)
-    if lat is None or lon is None:
-        return {"error": f"Could not resolve location: {location}"}
-
-    url = "https://api.openweathermap.org/data/2.5/weather"
-    params = {"lat": lat, "lon": lon, "appid": API_KEY, "units": "metric"}
-    response = requests.get(url, params=params)
-    response.raise_for_status()
-    return response.json()
-
-
-def extract_location(state: WeatherState) -> WeatherState:
-    query = state.get("user_query")
-    location = resolve_location(query, state["llm"])
-    if not location:
-        logger.error("❌ Could not detect a location")
-        return {**state, "error": "Could not detect a location."}
-    return {**state, "location": location}
-
-def check_cache(state: WeatherState) -> WeatherState:
-    location = state["location"]
-
-
-    if state_manager.has_recent_weather(location, CACHE_EXPIRY):
-        logger.info("🔄 Using in-memory cache")
-        data = state_manager.get_weather(location)
-        return {**state, "weather_data": data, "from_cache": True}
-
-
-    cached = get_weather_cache(location)
-    if cached:
-        ts = cached["timestamp"]
-        if isinstance(ts, str):
-            try:
-                ts = datetime.fromisoformat(ts)
-            except ValueError:
-                ts = datetime.strptime(ts, "%Y-%m-%d %H:%M:%S")
-        if datetime.now() - ts < CACHE_EXPIRY:
-            logger.info("📦 Using DB cache")
-            return {**state, "weather_data": cached["data"], "from_cache": True}
-
-    return {**state, "weather_data": None, "from_cache": False}
-
-def fetch_from_api(state: WeatherState) -> WeatherState:
-    if state["weather_data"] is not None:
-        return state
-    
-    location = state["location"]
-    logger.info(f"🌍 Fetching weather from API for {location}")
-    data = fetch_weather(location)
-    
-    if "error" in data:
-        logger.error(f"❌ {data['error']}")
-        return {**state, "error": data["error"]}
-
-    save_weather_cache(location, data)
-    state_manager.update_weather(location, data)
-    logger.info(f"✅ Weather data fetched from API: {data}")
-    return {**state, "weather_data": data}
-
-def format_answer(state: WeatherState) -> WeatherState:
-    if state.get("error"):
-        logger.error(f"❌ Error in state: {state['error']}")
-        return {**state, "final_answer": state["error"]}
-
-    query = state["user_query"]
-    data = state["weather_data"]
-    logger.info(f"📝 Formatting answer with data: {data}")
-
-    if not data:
-        return {**state, "final_answer": "No weather data available."}
-
-    llm_inst = state["llm"]
-    answer = format_response(query, data, llm_inst)
-    logger.info(f"🤖 LLM answer: {answer}")
-
-    return {**state, "final_answer": answer or "I couldn’t generate a response."}
-
-def build_weather_graph():
-    workflow = StateGraph(WeatherState)
-
-    workflow.add_node("extract_location", extract_location)
-    workflow.add_node("check_cache", check_cache)
-    workflow.add_node("fetch_from_api", fetch_from_api)
-    workflow.add_node("format_answer", format_answer)
-
-    workflow.set_entry_point("extract_location")
-
-    workflow.add_conditional_edges(
-        "extract_location",
-        lambda state: bool(state.get("error")),
-        {True: "format_answer", False: "check_cache"}
-    )
-
-    workflow.add_edge("check_cache", "fetch_from_api")
-    workflow.add_edge("fetch_from_api", "format_answer")
-    workflow.add_edge("format_answer", END)
-
-    return workflow.compile()
-
-graph = build_weather_graph()
-
-
-@app.post("/weather")
-def get_weather(query: Query):
-    state: WeatherState = {
-        "user_query": query.user_query,
-        "llm": llm,
-        "location": "",
+    # Optional; with one, follow-ups like "and tomorrow?" reuse the last location.
+    session_id: Optional[str] = None
+
+
+class BatchItem(BaseModel):
+    """Either free text (`user_query`) or structured fields, which skip the LLM."""
+    user_query: Optional[str] = None
+    name: Optional[str] = None
+    zip: Optional[str] = None
+    country: Optional[str] = None
+    lat: Optional[float] = None
+    lon: Optional[float] = None
+
+
+class BatchQuery(BaseModel):
+    items: list[BatchItem]
+
+
+def initial_state(user_query: str, session_id: Optional[str] = None) -> WeatherState:
+    return {
+        "user_query": user_query,
+        "session_id": session_id,
+        "llm": get_llm(),
+        "intent": None,
+        "units": "metric",
+        "time_ref": "now",
+        "location": None,
+        "coords": None,
+        "cache_key": None,
         "weather_data": None,
         "from_cache": False,
+        "cache_tier": None,
+        "stale_age_seconds": None,
         "final_answer": "",
         "error": ""
     }
-    result = graph.invoke(state)
+
+
+@app.post("/weather")
+async def get_weather(query: Query):
+    result = await get_weather_graph().ainvoke(initial_state(query.user_query, query.session_id))
+    logger.info("Answered {intent} query", intent=result.get("intent"), cache_tier=result.get("cache_tier"),
+                from_cache=result.get("from_cache"))
+    if result.get("weather_data") is not None:
+        result["weather_data"] = result["weather_data"].to_dict()
     return result
+
+
+@app.post("/weather/stream")
+async def stream_weather(query: Query):
+    return StreamingResponse(
+        stream_weather_events(get_weather_graph(), initial_state(query.user_query, query.session_id)),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@app.post("/weather/batch")
+async def get_weather_batch(batch: BatchQuery):
+    if len(batch.items) > BATCH_MAX_ITEMS:
+        raise HTTPException(status_code=413, detail=f"At most {BATCH_MAX_ITEMS} items per batch.")
+    return {"results": await run_batch(batch.items, get_llm())}
+
+
+@app.get("/metrics")
+async def metrics():
+    return Response(REGISTRY.render(), media_type=CONTENT_TYPE)
@@ -0,0 +1,122 @@
+import asyncio
+import os
+from Schema.model import Location
+from tools.location_resolver import aresolve_location
+from tools.weather_api import aget_coordinates
+from orchestrator.tiered_cache import weather_cache
+from orchestrator.prefetch import popularity
+from graph.weather_graph import weather_flight, fetch_cell, refresh_in_background, UPSTREAM_DOWN_REPLY
+from utils.geo import spatial_cell
+from utils.upstream import UpstreamUnavailable
+from utils.logger import logger
+
+BATCH_MAX_ITEMS = int(os.getenv("BATCH_MAX_ITEMS", "500"))
+BATCH_CONCURRENCY = int(os.getenv("BATCH_CONCURRENCY", "16"))
+
+
+def structured_location(item) -> Location | None:
+    """Build a Location straight from structured fields, skipping the LLM."""
+    if item.lat is not None and item.lon is not None:
+        return Location("coords", f"{item.lat},{item.lon}", item.lat, item.lon)
+    if item.zip:
+        return Location("zip", f"{item.zip},{(item.country or 'US').upper()}")
+    if item.name:
+        value = f"{item.name},{item.country}" if item.country else item.name
+        return Location("name", value)
+    return None
+
+
+async def run_batch(items, llm) -> list[dict]:
+    """
+    Same steps as the graph (extract -> geocode -> check_cache ->
+    fetch_from_api) for many items at once: one bulk L2 read for all
+    cache keys, misses fetched with bounded fan-out (single-flighted with
+    the graph's own fetches), one bulk upsert.
+    """
+    semaphore = asyncio.Semaphore(BATCH_CONCURRENCY)
+    results = [{"index": i, "status": "ok"} for i in range(len(items))]
+
+    async def bounded(coro):
+        async with semaphore:
+            return await coro
+
+    # 1. locations: structured fields directly, free text via the resolver
+    async def resolve(item):
+        return structured_location(item) or (
+            await bounded(aresolve_location(item.user_query, llm)) if item.user_query else None
+        )
+
+    locations = await asyncio.gather(*(resolve(item) for item in items), return_exceptions=True)
+
+    # 2. coordinates -> spatial cache cells
+    async def locate(location):
+        lat, lon = await bounded(aget_coordinates(location))
+        if lat is None or lon is None:
+            return None
+        return spatial_cell(lat, lon)
+
+    pending = {}
+    for result, location in zip(results, locations):
+        if isinstance(location, UpstreamUnavailable):
+            result.update(status="error", error=UPSTREAM_DOWN_REPLY)
+        elif isinstance(location, Exception) or location is None:
+            result.update(status="error", error="Could not detect a location.")
+        else:
+            result["location"] = location
+            pending[result["index"]] = locate(location)
+    cells = dict(zip(pending, await asyncio.gather(*pending.values(), return_exceptions=True)))
+
+    for index, cell in cells.items():
+        if isinstance(cell, Exception) or cell is None:
+            results[index].update(status="error", error=f"Could not resolve location: {results[index]['location']}")
+        else:
+            results[index]["cache_key"] = cell[0]
+
+    # 3. one bulk cache read for every distinct cell
+    wanted = {cells[i][0]: cells[i][1:] for i in cells if results[i]["status"] == "ok"}
+    for key, coords in wanted.items():
+        popularity.record(key, coords)
+    hits = await weather_cache.alookup_many(list(wanted))
+    for key, hit in hits.items():
+        if hit.stale:
+            refresh_in_background(key, wanted[key])
+
+    # 4. fetch each missing cell once, bounded, then one bulk upsert. The
+    # flight is shared with /weather and prefetch (same key, same result
+    # type); whoever leads a flight stores its result, so the batch only
+    # writes the cells it fetched itself.
+    led = {}
+
+    async def fetch(key, coords):
+        led[key] = data = await fetch_cell(key, coords)
+        return data
+
+    misses = [key for key in wanted if key not in hits]
+    fetched = await asyncio.gather(
+        *(bounded(weather_flight.do(key, fetch, key, wanted[key])) for key in misses),
+        return_exceptions=True,
+    )
+    outcomes = dict(zip(misses, fetched))
+    fresh = {key: data for key, data in outcomes.items() if not isinstance(data, Exception)}
+    if led:
+        await weather_cache.astore_many(led)
+    # failed fetches fall back to the newest cached entry, however expired
+    failed = [key for key in misses if key not in fresh]
+    last_known = dict(zip(failed, await asyncio.gather(*(weather_cache.alast_known(key) for key in failed))))
+    logger.info("Batch of {}: {} cached cells, {}/{} fetched", len(items), len(hits), len(fresh), len(misses))
+
+    for result in results:
+        key = result.pop("cache_key", None)
+        if result["status"] != "ok":
+            continue
+        if key in hits:
+            result.update(data=hits[key].data.to_dict(), from_cache=True, cache_tier=hits[key].tier)
+        elif key in fresh:
+            result.update(data=fresh[key].to_dict(), from_cache=False, cache_tier=None)
+        elif last_known.get(key):
+            hit = last_known[key]
+            result.update(data=hit.data.to_dict(), from_cache=True, cache_tier=hit.tier,
+                          stale_age_seconds=int(hit.age.total_seconds()))
+        else:
+            result.update(status="error", error=f"Weather fetch failed: {outcomes[key]}")
+    return results
@@ -1,48 +1,59 @@
-from database.cache import get_weather_cache, save_weather_cache
-from tools.weather_api import fetch_weather
+from tools.weather_api import get_coordinates, fetch_weather_at
 from tools.location_resolver import resolve_location
 from utils.logger import logger
-from datetime import datetime, timedelta
-from orchestrator.state_manager import StateManager
+from orchestrator.tiered_cache import weather_cache
+from utils.singleflight import SingleFlight
+from utils.geo import spatial_cell
+from database.codec import to_snapshot
+from utils.upstream import UpstreamUnavailable
+import httpx
+import threading
 
 
-CACHE_EXPIRY = timedelta(minutes=30)
-state_manager = StateManager()
+weather_flight = SingleFlight()
+
+
+def _fetch_and_store(key, lat, lon):
+    weather_data = to_snapshot(fetch_weather_at(lat, lon))
+    weather_cache.store(key, weather_data)
+    return weather_data
+
+
+def _refresh_in_background(key, lat, lon):
+    threading.Thread(
+        target=weather_flight.do, args=(key, _fetch_and_store, key, lat, lon), daemon=True
+    ).start()
 
 
 def orchestrate(user_query, llm):
 
-    location = resolve_location(user_query, llm)
+    try:
+        location = resolve_location(user_query, llm)
+    except UpstreamUnavailable:
+        return "the language model is temporarily unavailable"
     if not location:
         return "couldn't detect a location"
 
-
-    if state_manager.has_recent_weather(location, CACHE_EXPIRY):
-        logger.info("Using in-memory cached weather data")
-        weather_data = state_manager.get_weather(location)
+    lat, lon = get_coordinates(location)
+    if lat is None or lon is None:
+        return {"error": f"Could not resolve location: {location}"}
+    key, lat, lon = spatial_cell(lat, lon)
+
+    hit = weather_cache.lookup(key)
+    if hit is None:
+        logger.info("Fetching fresh weather data (no cache)")
+        try:
+            return weather_flight.do(key, _fetch_and_store, key, lat, lon)
+        except (UpstreamUnavailable, httpx.HTTPError) as e:
+            hit = weather_cache.last_known(key)
+            if hit is None:
+                raise
+            logger.warning("Weather fetch failed ({!r}), using {} cached data from {}", e, hit.tier, hit.timestamp)
+            return hit.data
+
+    if hit.stale:
+        logger.info("Using stale {} cached weather data, refreshing in background", hit.tier)
+        _refresh_in_background(key, lat, lon)
     else:
-   
-        cached = get_weather_cache(location)
-        if cached:
-            ts = cached["timestamp"]
-            if isinstance(ts, str):
-                try:
-                    ts = datetime.fromisoformat(ts)
-                except ValueError:
-                    ts = datetime.strptime(ts, "%Y-%m-%d %H:%M:%S") 
-
-            if datetime.now() - ts < CACHE_EXPIRY:
-                logger.info("Using DB cached weather data")
-                weather_data = cached["data"]
-            else:
-                logger.info("Fetching fresh weather data (cache expired)")
-                weather_data = fetch_weather(location)
-                save_weather_cache(location, weather_data)
-        else:
-            
-            logger.info("Fetching fresh weather data (no cache)")
-            weather_data = fetch_weather(location)  
-            save_weather_cache(location, weather_data)
-
-        state_manager.update_weather(location, weather_data)
-    return weather_data
+        logger.info("Using {} cached weather data", hit.tier)
+    return hit.data
@@ -0,0 +1,145 @@
+import asyncio
+import heapq
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+from utils.logger import logger
+
+PREFETCH_ENABLED = os.getenv("PREFETCH_ENABLED", "1") == "1"
+PREFETCH_TOP_N = int(os.getenv("PREFETCH_TOP_N", "50"))
+PREFETCH_INTERVAL = float(os.getenv("PREFETCH_INTERVAL_SECONDS", "60"))
+# Refresh a hot key when it has less than this long left before expiry.
+# Must be shorter than the cache's minimum TTL, or every hot key would be
+# due on every pass.
+PREFETCH_LEAD = timedelta(seconds=float(os.getenv("PREFETCH_LEAD_SECONDS", "60")))
+# Upper bound on upstream calls the scheduler may make per interval.
+PREFETCH_BUDGET = int(os.getenv("PREFETCH_BUDGET", "20"))
+POPULARITY_HALF_LIFE = float(os.getenv("POPULARITY_HALF_LIFE_SECONDS", "1800"))
+POPULARITY_MAX_KEYS = int(os.getenv("POPULARITY_MAX_KEYS", "20000"))
+# Decayed score below which a key is forgotten rather than prefetched; with
+# the default a single request keeps a key for one half-life.
+PREFETCH_MIN_SCORE = float(os.getenv("PREFETCH_MIN_SCORE", "0.5"))
+
+
+class PopularityTracker:
+    """
+    Exponentially decayed access counts per cache key, so "hot" means
+    recently popular rather than popular since boot. Keeps the coordinates
+    each key was fetched at so the scheduler can refresh it without a request.
+    """
+
+    def __init__(self, half_life: float = POPULARITY_HALF_LIFE, max_keys: int = POPULARITY_MAX_KEYS,
+                 min_score: float = PREFETCH_MIN_SCORE):
+        self.half_life = half_life
+        self.max_keys = max_keys
+        self.min_score = min_score
+        self._scores = {}  # key -> [score, last_seen, coords]
+        self._lock = threading.Lock()
+
+    def _decayed(self, score: float, last: float, now: float) -> float:
+        return score * 0.5 ** ((now - last) / self.half_life)
+
+    def record(self, key: str, coords):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._scores.get(key)
+            if entry is None:
+                if len(self._scores) >= self.max_keys:
+                    self._prune(now)
+                self._scores[key] = [1.0, now, coords]
+            else:
+                entry[0] = self._decayed(entry[0], entry[1], now) + 1.0
+                entry[1] = now
+                entry[2] = coords
+
+    def _prune(self, now: float):
+        # Drop the coldest 10% in one go rather than one key per insert.
+        keep = int(self.max_keys * 0.9)
+        ranked = heapq.nlargest(keep, self._scores.items(), key=lambda kv: self._decayed(kv[1][0], kv[1][1], now))
+        self._scores = dict(ranked)
+
+    def top(self, n: int) -> list[tuple[str, tuple, float]]:
+        """The n hottest keys as (key, coords, score); keys that cooled below `min_score` are dropped."""
+        now = time.monotonic()
+        with self._lock:
+            scored = [(key, coords, self._decayed(score, last, now)) for key, (score, last, coords) in self._scores.items()]
+            for key, _, score in scored:
+                if score < self.min_score:
+                    del self._scores[key]
+        return heapq.nlargest(n, (item for item in scored if item[2] >= self.min_score), key=lambda item: item[2])
+
+
+class PrefetchScheduler:
+    """
+    Background task that refreshes the hottest keys shortly before their
+    cache entry expires, within an upstream-call budget per interval.
+    """
+
+    def __init__(self, tracker: PopularityTracker, cache, refresh, top_n: int = PREFETCH_TOP_N,
+                 interval: float = PREFETCH_INTERVAL, lead: timedelta = PREFETCH_LEAD, budget: int = PREFETCH_BUDGET):
+        self.tracker = tracker
+        self.cache = cache
+        min_ttl = getattr(cache.policy, "min_ttl", None)
+        if min_ttl is not None and lead >= min_ttl:
+            raise ValueError(f"PREFETCH_LEAD ({lead}) must be shorter than the minimum cache TTL ({min_ttl})")
+        self.refresh = refresh  # async (cache_key, coords) -> data
+        self.top_n = top_n
+        self.interval = interval
+        self.lead = lead
+        self.budget = budget
+        self.prefetched = 0
+        self.failures = 0
+        self._task = None
+
+    def _due(self, key: str) -> bool:
+        entry = self.cache.l1.session_state.peek(key)
+        if entry is None:
+            return True
+        ts, data = entry
+        return datetime.now() >= self.cache.expires_at(key, data, ts) - self.lead
+
+    def _due_keys(self, hot) -> list[tuple[str, tuple]]:
+        return [(key, coords) for key, coords, _ in hot if self._due(key)]
+
+    async def run_once(self) -> int:
+        """One scheduling pass; returns how many keys were refreshed."""
+        hot = self.tracker.top(self.top_n)
+        if self.cache.l1.blocking:
+            # shared SQLite L1: peeks can wait on another worker's lock
+            due = await asyncio.to_thread(self._due_keys, hot)
+        else:
+            due = self._due_keys(hot)
+        due = due[: self.budget]
+        if not due:
+            return 0
+        results = await asyncio.gather(*(self.refresh(key, coords) for key, coords in due), return_exceptions=True)
+        failed = sum(isinstance(r, Exception) for r in results)
+        self.prefetched += len(due) - failed
+        self.failures += failed
+        logger.info("Prefetched {}/{} hot locations", len(due) - failed, len(due))
+        return len(due) - failed
+
+    async def _loop(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.run_once()
+            except Exception as e:
+                logger.warning("Prefetch pass failed: {}", e)
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._loop())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+popularity = PopularityTracker()
@@ -0,0 +1,48 @@
+import os
+from dataclasses import dataclass
+from datetime import timedelta
+from typing import Optional
+from Schema.model import Location, Units
+from utils.ttl_cache import TTLCache
+
+SESSION_TTL = timedelta(minutes=int(os.getenv("SESSION_TTL_MINUTES", "30")))
+SESSION_MAX_ENTRIES = int(os.getenv("SESSION_MAX_ENTRIES", "10000"))
+SESSION_MAX_BYTES = int(os.getenv("SESSION_MAX_BYTES", str(8 * 1024 * 1024)))
+
+
+@dataclass(frozen=True, slots=True)
+class SessionContext:
+    """What a follow-up query needs to skip extraction and geocoding."""
+    location: Location
+    coords: tuple[float, float]
+    cache_key: str
+    units: Units = "metric"
+
+
+class SessionStore:
+    """
+    Last resolved location per session id, bounded by entry count and
+    bytes with LRU eviction, and forgotten after `ttl` of inactivity.
+    The weather itself is not copied here: follow-ups read it from the
+    weather cache by `cache_key`, so they get the same freshness rules.
+    """
+
+    def __init__(self, ttl: timedelta = SESSION_TTL, max_entries: int = SESSION_MAX_ENTRIES,
+                 max_bytes: int = SESSION_MAX_BYTES):
+        self._contexts = TTLCache(max_entries=max_entries, max_bytes=max_bytes, ttl=ttl)
+
+    def get(self, session_id: Optional[str]) -> Optional[SessionContext]:
+        if not session_id:
+            return None
+        return self._contexts.get(session_id)
+
+    def remember(self, session_id: Optional[str], context: SessionContext):
+        # re-set on every answered query, which also restarts the TTL
+        if session_id:
+            self._contexts.set(session_id, context)
+
+    def stats(self) -> dict:
+        return self._contexts.stats()
+
+
+session_store = SessionStore()
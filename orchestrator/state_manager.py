@@ -1,25 +1,46 @@
+import os
 from datetime import datetime, timedelta
+from database.codec import get_codec
+from utils.ttl_cache import TTLCache
+from utils.shared_cache import SQLiteTTLCache
+
+STATE_MAX_ENTRIES = int(os.getenv("STATE_MAX_ENTRIES", "10000"))
+STATE_MAX_BYTES = int(os.getenv("STATE_MAX_BYTES", str(64 * 1024 * 1024)))
+STATE_TTL = timedelta(minutes=int(os.getenv("STATE_TTL_MINUTES", "30")))
+# "memory": per-process dict (default). "sqlite": one WAL-mode SQLite file
+# shared by every worker on the host (see utils.shared_cache).
+L1_BACKEND = os.getenv("L1_BACKEND", "memory")
 
 class StateManager:
-    def __init__(self):
-       
-        self.session_state = {}
+    def __init__(self, max_entries: int = STATE_MAX_ENTRIES, max_bytes: int = STATE_MAX_BYTES, ttl: timedelta = STATE_TTL,
+                 backend: str = L1_BACKEND, codec=None):
+        # True when calls can wait on file locks; async callers then use a thread.
+        self.blocking = backend == "sqlite"
+        if backend == "sqlite":
+            # Values cross process boundaries, so store them with the DB codec.
+            codec = codec or get_codec()
+            self.session_state = SQLiteTTLCache(max_entries=max_entries, ttl=ttl, dumps=codec.encode, loads=codec.decode)
+        elif backend == "memory":
+            # Bounded, thread-safe, expiring store; safe to share across FastAPI's threadpool.
+            self.session_state = TTLCache(max_entries=max_entries, max_bytes=max_bytes, ttl=ttl)
+        else:
+            raise ValueError(f"Unknown L1_BACKEND: {backend}")
+
+    def get_fresh(self, location: str, expiry: timedelta):
+        """Atomically return weather data younger than `expiry`, else None."""
+        return self.session_state.get(location, max_age=expiry)
 
     def has_recent_weather(self, location: str, expiry: timedelta) -> bool:
         """Check if we have recent weather for a location."""
-        if location not in self.session_state:
-            return False
-
-        ts, _ = self.session_state[location]
-        return datetime.now() - ts < expiry
+        return self.get_fresh(location, expiry) is not None
 
     def get_weather(self, location: str):
         """Retrieve cached weather data (dict) if available."""
-        if location in self.session_state:
-            _, data = self.session_state[location]
-            return data
-        return None
+        return self.session_state.get(location)
 
-    def update_weather(self, location: str, weather_data: dict):
+    def update_weather(self, location: str, weather_data: dict, timestamp: datetime | None = None):
         """Update in-memory cache with latest weather data (dict)."""
-        self.session_state[location] = (datetime.now(), weather_data)
+        self.session_state.set(location, weather_data, timestamp)
+
+    def stats(self) -> dict:
+        return self.session_state.stats()
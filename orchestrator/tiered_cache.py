@@ -0,0 +1,208 @@
+import asyncio
+import os
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Any, Optional
+from database.cache import (
+    get_weather_cache, save_weather_cache, get_weather_cache_many, save_weather_cache_many, get_recent_weather_cache,
+)
+from database.write_behind import write_behind
+from database.codec import FORECAST_CODEC
+from Schema.model import WeatherSnapshot, ForecastSeries
+from orchestrator.state_manager import StateManager, STATE_MAX_ENTRIES, STATE_MAX_BYTES
+from orchestrator.ttl_policy import TTLPolicy, FixedTTLPolicy, ttl_policy
+from utils.metrics import CACHE_LOOKUPS
+
+# How long past its expiry (see orchestrator.ttl_policy) an entry may
+# still be served while a background refresh replaces it.
+STALE_GRACE = timedelta(minutes=int(os.getenv("CACHE_STALE_GRACE_MINUTES", "10")))
+# Oldest entry still served, marked with its age, when the upstream is
+# unavailable (circuit open, quota exhausted, fetch failed).
+FALLBACK_MAX_AGE = timedelta(hours=int(os.getenv("CACHE_FALLBACK_MAX_AGE_HOURS", "24")))
+# Forecasts are re-issued upstream every 3 hours; one fetch per cell serves
+# every time-windowed question until this expires.
+FORECAST_TTL = timedelta(minutes=int(os.getenv("FORECAST_TTL_MINUTES", "60")))
+# Forecasts share the weather_cache table, under their own keys.
+FORECAST_PREFIX = "forecast:"
+
+
+@dataclass
+class CacheHit:
+    data: Any
+    tier: str            # "l1" (in-memory) or "l2" (database)
+    timestamp: datetime
+    stale: bool          # expired but within STALE_GRACE; caller should refresh
+
+    @property
+    def age(self) -> timedelta:
+        return datetime.now() - self.timestamp
+
+
+def _count(tier: str, hit: Optional[CacheHit]) -> Optional[CacheHit]:
+    result = "miss" if hit is None else "stale" if hit.stale else "hit"
+    CACHE_LOOKUPS.labels(tier=tier, result=result).inc()
+    return hit
+
+
+def _parse_ts(ts) -> datetime:
+    if isinstance(ts, str):
+        try:
+            return datetime.fromisoformat(ts)
+        except ValueError:
+            return datetime.strptime(ts, "%Y-%m-%d %H:%M:%S")
+    return ts
+
+
+class TieredWeatherCache:
+    """
+    L1 (StateManager, in-process) in front of L2 (weather_cache table).
+    L2 hits are promoted into L1 with their original timestamp so the
+    next request for that key never touches the DB. Both tiers expire
+    entries by the same `policy`; entries up to `stale_grace` past expiry
+    are returned marked stale rather than treated as misses. With a `writer` (write-behind queue), L2 writes
+    are queued instead of done in the request path.
+    """
+
+    def __init__(self, policy: TTLPolicy = ttl_policy, stale_grace: timedelta = STALE_GRACE, writer=write_behind,
+                 fallback_max_age: timedelta = FALLBACK_MAX_AGE, value_type: type = WeatherSnapshot, codec=None):
+        self.policy = policy
+        self.value_type = value_type
+        self.stale_grace = stale_grace
+        self.fallback_max_age = fallback_max_age
+        self.writer = writer
+        # L1's own TTL is only a backstop at the longest servable window;
+        # actual expiry is decided per entry by the policy.
+        self.l1 = StateManager(STATE_MAX_ENTRIES, STATE_MAX_BYTES, ttl=policy.max_ttl + stale_grace, codec=codec)
+
+    async def _l1_call(self, fn, *args):
+        """Run an L1 step inline, or in a thread for a backend that can block (shared SQLite)."""
+        if self.l1.blocking:
+            return await asyncio.to_thread(fn, *args)
+        return fn(*args)
+
+    def expires_at(self, key: str, data, ts: datetime) -> datetime:
+        return self.policy.expires_at(key, data, ts)
+
+    def _classify(self, key: str, data, ts: datetime, tier: str, tally: bool = True) -> Optional[CacheHit]:
+        now = datetime.now()
+        expires = self.expires_at(key, data, ts)
+        fresh = now < expires
+        if tally:
+            self.policy.tally(fresh, ts, now)
+        if now >= expires + self.stale_grace:
+            return None
+        return CacheHit(data, tier, ts, stale=not fresh)
+
+    def _lookup_l1(self, key: str) -> Optional[CacheHit]:
+        entry = self.l1.session_state.get_entry(key)
+        if entry is None:
+            return _count("l1", None)
+        ts, data = entry
+        return _count("l1", self._classify(key, data, ts, "l1"))
+
+    def _promote(self, key: str, cached, tally: bool = True) -> Optional[CacheHit]:
+        if not cached:
+            return None
+        ts = _parse_ts(cached["timestamp"])
+        hit = self._classify(key, cached["data"], ts, "l2", tally)
+        if hit:
+            self.l1.update_weather(key, hit.data, ts)
+        return hit
+
+    def lookup(self, key: str) -> Optional[CacheHit]:
+        return self._lookup_l1(key) or _count("l2", self._promote(key, get_weather_cache(key)))
+
+    async def alookup(self, key: str) -> Optional[CacheHit]:
+        hit = await self._l1_call(self._lookup_l1, key)
+        if hit:
+            return hit
+        # blocking driver, so keep it off the event loop
+        cached = await asyncio.to_thread(get_weather_cache, key)
+        return _count("l2", await self._l1_call(self._promote, key, cached))
+
+    async def alookup_many(self, keys: list[str]) -> dict:
+        """{key: CacheHit} for every key servable from L1, or from L2 via one bulk query."""
+        keys = list(dict.fromkeys(keys))
+        hits = await self._l1_call(self._lookup_l1_many, keys)
+        missing = [key for key in keys if key not in hits]
+        if missing:
+            rows = await asyncio.to_thread(get_weather_cache_many, missing)
+            hits.update(await self._l1_call(self._promote_many, missing, rows))
+        return hits
+
+    def _lookup_l1_many(self, keys: list[str]) -> dict:
+        return {key: hit for key in keys if (hit := self._lookup_l1(key))}
+
+    def _promote_many(self, keys: list[str], rows: dict) -> dict:
+        return {key: hit for key in keys if (hit := _count("l2", self._promote(key, rows.get(key))))}
+
+    def _last_known_l1(self, key: str) -> Optional[CacheHit]:
+        # peek ignores the L1 TTL, so entries past the grace window still count
+        entry = self.l1.session_state.peek(key)
+        if entry is None:
+            return None
+        hit = CacheHit(entry[1], "l1", entry[0], stale=True)
+        return hit if hit.age < self.fallback_max_age else None
+
+    def _last_known_l2(self, cached) -> Optional[CacheHit]:
+        if cached is None:
+            return None
+        hit = CacheHit(cached["data"], "l2", _parse_ts(cached["timestamp"]), stale=True)
+        return hit if hit.age < self.fallback_max_age else None
+
+    def last_known(self, key: str) -> Optional[CacheHit]:
+        """
+        Newest entry for `key` up to `fallback_max_age` old, whatever its
+        expiry; for answering while the upstream is unavailable.
+        """
+        return self._last_known_l1(key) or self._last_known_l2(get_weather_cache(key))
+
+    async def alast_known(self, key: str) -> Optional[CacheHit]:
+        return (
+            await self._l1_call(self._last_known_l1, key)
+            or self._last_known_l2(await asyncio.to_thread(get_weather_cache, key))
+        )
+
+    async def warm(self, limit: int) -> int:
+        """Seed L1 with up to `limit` of the newest servable L2 rows; returns how many."""
+        since = datetime.now() - self.policy.max_ttl - self.stale_grace
+        rows = await asyncio.to_thread(get_recent_weather_cache, since, limit)
+        rows = {key: cached for key, cached in rows.items() if isinstance(cached["data"], self.value_type)}
+        return await self._l1_call(self._warm_l1, rows)
+
+    def _warm_l1(self, rows: dict) -> int:
+        return sum(self._promote(key, cached, tally=False) is not None for key, cached in rows.items())
+
+    def _update_l1_many(self, entries: dict):
+        for key, data in entries.items():
+            self.l1.update_weather(key, data)
+
+    def store(self, key: str, data: WeatherSnapshot):
+        self.policy.observe(key, data)
+        self.l1.update_weather(key, data)
+        if self.writer:
+            self.writer.put(key, data)
+        else:
+            save_weather_cache(key, data)
+
+    async def astore(self, key: str, data: WeatherSnapshot):
+        self.policy.observe(key, data)
+        await self._l1_call(self.l1.update_weather, key, data)
+        if self.writer:
+            self.writer.put(key, data)
+        else:
+            await asyncio.to_thread(save_weather_cache, key, data)
+
+    async def astore_many(self, entries: dict):
+        for key, data in entries.items():
+            self.policy.observe(key, data)
+        await self._l1_call(self._update_l1_many, entries)
+        if self.writer:
+            for key, data in entries.items():
+                self.writer.put(key, data)
+        else:
+            await asyncio.to_thread(save_weather_cache_many, entries)
+
+
+weather_cache = TieredWeatherCache()
+forecast_cache = TieredWeatherCache(FixedTTLPolicy(FORECAST_TTL), value_type=ForecastSeries, codec=FORECAST_CODEC)
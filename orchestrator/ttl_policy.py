@@ -0,0 +1,165 @@
+"""
+Cache expiry derived from the reading itself instead of from when we
+stored it. Upstream publishes a new observation for a location every so
+often (its cadence: at most TTL_UPDATE_INTERVAL, shorter if we see it
+publish faster), so a reading observed at `dt` will not change before
+about dt + cadence: fetching again sooner is wasted, and counting age
+from our save time understates how old the data really is. Per location,
+the TTL is stretched for steady readings and shortened for changing ones.
+"""
+import os
+import threading
+from collections import deque
+from datetime import datetime, timedelta
+
+# How often upstream publishes a new reading. Per location it can only be
+# learned shorter: we fetch no more often than our own TTL, so the gaps
+# between the `dt` values we see measure that, not upstream's cadence.
+TTL_UPDATE_INTERVAL = timedelta(minutes=float(os.getenv("TTL_UPDATE_INTERVAL_MINUTES", "10")))
+TTL_MIN = timedelta(minutes=float(os.getenv("TTL_MIN_MINUTES", "2")))
+TTL_MAX = timedelta(minutes=float(os.getenv("TTL_MAX_MINUTES", "60")))
+TTL_ADAPTIVE = os.getenv("TTL_ADAPTIVE", "1") == "1"
+# Mean change between consecutive readings (°C) that keeps the TTL at one
+# cadence; steadier locations get up to TTL_MAX_FACTOR cadences, busier
+# ones down to TTL_MIN_FACTOR.
+TTL_STABLE_DELTA = float(os.getenv("TTL_STABLE_DELTA", "1.5"))
+TTL_MIN_FACTOR = float(os.getenv("TTL_MIN_FACTOR", "0.5"))
+TTL_MAX_FACTOR = float(os.getenv("TTL_MAX_FACTOR", "2"))
+TTL_HISTORY = int(os.getenv("TTL_HISTORY", "6"))
+TTL_MAX_KEYS = int(os.getenv("TTL_MAX_KEYS", "20000"))
+# The old fixed expiry, measured from save time. Only used to count the
+# lookups this policy decides differently.
+TTL_BASELINE = timedelta(minutes=float(os.getenv("TTL_BASELINE_MINUTES", "30")))
+
+# A change of condition (e.g. clear -> rain) weighs like this many °C.
+_CONDITION_CHANGE = 2.0
+
+
+class TTLPolicy:
+    """
+    expires_at = observed (`dt`, else save time) + cadence x volatility
+    factor, clamped to [save time + min_ttl, save time + max_ttl]. Cadence
+    and factor come from the last few distinct readings fetched for the
+    key in this process; without history they are `interval` and 1. A
+    refetch that brings back the same `dt` means upstream is late, so that
+    copy counts from when it was stored instead, doubling the wait for each
+    further refetch of the same reading (up to max_ttl).
+    """
+
+    def __init__(self, interval: timedelta = TTL_UPDATE_INTERVAL, min_ttl: timedelta = TTL_MIN,
+                 max_ttl: timedelta = TTL_MAX, adaptive: bool = TTL_ADAPTIVE, history: int = TTL_HISTORY,
+                 max_keys: int = TTL_MAX_KEYS, baseline: timedelta = TTL_BASELINE):
+        self.interval = interval
+        self.min_ttl = min_ttl
+        self.max_ttl = max_ttl
+        self.adaptive = adaptive
+        self.history = history
+        self.max_keys = max_keys
+        self.baseline = baseline
+        self._readings = {}  # key -> deque[(dt, temp, description)]
+        self._refetched = {}  # key -> (latest dt, refetches that returned it again)
+        self._lock = threading.Lock()
+        self.avoided_fetches = 0      # served fresh, but older than the baseline allowed
+        self.early_refreshes = 0      # expired, though the baseline would still have served it
+        self.unchanged_refetches = 0  # fetched a reading we already had (same `dt`)
+
+    def observe(self, key: str, snapshot):
+        """Record a freshly fetched reading for `key`."""
+        dt = getattr(snapshot, "dt", None)
+        if dt is None:
+            return
+        with self._lock:
+            readings = self._readings.get(key)
+            if readings is None:
+                if len(self._readings) >= self.max_keys:
+                    # dicts keep insertion order: drop the oldest-tracked key
+                    oldest = next(iter(self._readings))
+                    del self._readings[oldest]
+                    self._refetched.pop(oldest, None)
+                readings = self._readings[key] = deque(maxlen=self.history)
+            elif dt <= readings[-1][0]:
+                # the reading we already had (or an older one)
+                self.unchanged_refetches += 1
+                if dt == readings[-1][0]:
+                    repeats = self._refetched.get(key, (dt, 0))[1]
+                    self._refetched[key] = (dt, repeats + 1)
+                return
+            readings.append((dt, snapshot.temp, snapshot.description))
+            self._refetched.pop(key, None)
+
+    def _history(self, key: str) -> list:
+        with self._lock:
+            return list(self._readings.get(key) or ())
+
+    def cadence(self, key: str) -> timedelta:
+        """
+        Smallest gap between the distinct observations seen for `key`, capped
+        at `interval`; stretching the TTL is left to the volatility factor.
+        """
+        readings = self._history(key)
+        if len(readings) < 2:
+            return self.interval
+        gap = min(new[0] - old[0] for old, new in zip(readings, readings[1:]))
+        return min(timedelta(seconds=gap), self.interval)
+
+    def volatility_factor(self, key: str) -> float:
+        if not self.adaptive:
+            return 1.0
+        readings = self._history(key)
+        if len(readings) < 2:
+            return 1.0
+        changes = [
+            abs((new[1] or 0.0) - (old[1] or 0.0)) + (_CONDITION_CHANGE if new[2] != old[2] else 0.0)
+            for old, new in zip(readings, readings[1:])
+        ]
+        delta = sum(changes) / len(changes)
+        if delta <= 0:
+            return TTL_MAX_FACTOR
+        return min(max(TTL_STABLE_DELTA / delta, TTL_MIN_FACTOR), TTL_MAX_FACTOR)
+
+    def expires_at(self, key: str, snapshot, stored_at: datetime) -> datetime:
+        dt = getattr(snapshot, "dt", None)
+        observed = datetime.fromtimestamp(dt) if dt else stored_at
+        wait = self.cadence(key) * self.volatility_factor(key)
+        refetched_dt, repeats = self._refetched.get(key, (None, 0))
+        if dt and dt == refetched_dt:
+            # asked again and got nothing newer: back off from then
+            observed = max(observed, stored_at)
+            wait *= 2 ** min(repeats - 1, 16)
+        expires = observed + wait
+        return min(max(expires, stored_at + self.min_ttl), stored_at + self.max_ttl)
+
+    def tally(self, fresh: bool, stored_at: datetime, now: datetime):
+        """Count a lookup the fixed baseline expiry would have decided the other way."""
+        age = now - stored_at
+        if fresh and age >= self.baseline:
+            self.avoided_fetches += 1
+        elif not fresh and age < self.baseline:
+            self.early_refreshes += 1
+
+    def stats(self) -> dict:
+        return {
+            "tracked_keys": len(self._readings),
+            "avoided_fetches": self.avoided_fetches,
+            "early_refreshes": self.early_refreshes,
+            "unchanged_refetches": self.unchanged_refetches,
+        }
+
+
+class FixedTTLPolicy:
+    """Same interface as TTLPolicy, but every entry lives `ttl` from save time (used for forecasts)."""
+
+    def __init__(self, ttl: timedelta):
+        self.max_ttl = ttl
+
+    def observe(self, key: str, value):
+        pass
+
+    def expires_at(self, key: str, value, stored_at: datetime) -> datetime:
+        return stored_at + self.max_ttl
+
+    def tally(self, fresh: bool, stored_at: datetime, now: datetime):
+        pass
+
+
+ttl_policy = TTLPolicy()
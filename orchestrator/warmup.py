@@ -0,0 +1,44 @@
+import asyncio
+import os
+import time
+from classifiers.intent_classifire import get_query_extractor
+from graph.weather_graph import get_weather_graph
+from orchestrator.tiered_cache import weather_cache
+from tools.extraction_cache import extraction_cache
+from tools.gazetteer import gazetteer
+from tools.weather_api import WEATHER_URL
+from utils.http_client import get_async_client
+from utils.LLM_init import get_llm
+from utils.logger import logger
+
+WARMUP_ON_STARTUP = os.getenv("WARMUP_ON_STARTUP", "1") == "1"
+# Newest weather_cache rows to load into L1 before serving.
+WARMUP_L1_ROWS = int(os.getenv("WARMUP_L1_ROWS", "500"))
+
+
+async def _open_upstream_connection():
+    # Any response will do; what we want is the TCP + TLS handshake in the pool.
+    await get_async_client().head(WEATHER_URL)
+
+
+async def warm_up():
+    """
+    Build clients and fill caches before the worker takes traffic, so the
+    first requests don't pay for them. Each step is best-effort.
+    """
+    started = time.perf_counter()
+    get_weather_graph()
+    get_query_extractor(get_llm())
+    gazetteer.open()
+
+    steps = {
+        "extraction cache": asyncio.to_thread(extraction_cache.preload),
+        "L1 cache": weather_cache.warm(WARMUP_L1_ROWS),
+        "upstream connection": _open_upstream_connection(),
+    }
+    results = await asyncio.gather(*steps.values(), return_exceptions=True)
+    for name, result in zip(steps, results):
+        if isinstance(result, Exception):
+            logger.warning("Warm-up of {} failed: {}", name, result)
+    warmed = results[1] if isinstance(results[1], int) else 0
+    logger.info("Warm-up finished in {:.2f}s ({} L1 entries)", time.perf_counter() - started, warmed)
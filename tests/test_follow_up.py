@@ -0,0 +1,25 @@
+import pytest
+from classifiers.intent_classifire import is_follow_up
+
+
+@pytest.mark.parametrize("query, expected", [
+    # refer back to the session's location
+    ("and tomorrow?", True),
+    ("what about humidity there?", True),
+    ("is it cold there", True),
+    ("is there any rain tomorrow", True),
+    ("how about in the evening", True),
+    ("is it hot in here", True),
+    ("same place tomorrow", True),
+    # smalltalk
+    ("hi there", False),
+    ("hello there", False),
+    ("hey there, how are you?", False),
+    # name a new place
+    ("is there rain in tokyo?", False),
+    ("will there be snow in denver tomorrow", False),
+    ("what about in london", False),
+    ("weather in paris", False),
+])
+def test_is_follow_up(query, expected):
+    assert is_follow_up(query) is expected
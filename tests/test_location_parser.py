@@ -0,0 +1,55 @@
+import pytest
+from Schema.model import Location
+from tools.location_parser import parse_location, classify_location
+
+
+@pytest.mark.parametrize("query, expected", [
+    # coordinates
+    ("weather at 40.7128, -74.0060", Location("coords", "40.7128,-74.006", 40.7128, -74.006)),
+    ("weather at 48°51'N 2°21'E", Location("coords", "48.85,2.35", 48.85, 2.35)),
+    # postal codes
+    ("weather for 10001", Location("zip", "10001,US")),
+    ("weather for 94103-1234", Location("zip", "94103,US")),
+    ("weather in SW1A 1AA", Location("zip", "SW1A,GB")),
+    ("weather in 1012 AB", Location("zip", "1012AB,NL")),
+    ("weather in 110001", Location("zip", "110001,IN")),
+    ("weather for 75001, FR", Location("zip", "75001,FR")),
+    # aliases
+    ("how hot is it in NYC", Location("name", "New York")),
+    ("is it raining in bombay", Location("name", "Mumbai")),
+    # named places, including ones followed by numbers that look like postcodes
+    ("weather in Paris", Location("name", "Paris")),
+    ("forecast for Rio de Janeiro", Location("name", "Rio de Janeiro")),
+    ("weather in Delhi at 1130 PM", Location("name", "Delhi")),
+    ("weather in Amsterdam 2024 EU", Location("name", "Amsterdam")),
+    ("weather in Paris 75001", Location("name", "Paris")),
+    ("weather in London SW1A 1AA", Location("name", "London")),
+    ("weather in Berlin tomorrow", Location("name", "Berlin")),
+    ("will it rain in London on Friday", Location("name", "London")),
+    ("forecast for Stratford upon Avon", Location("name", "Stratford upon Avon")),
+    ("weather in St. Louis", Location("name", "St. Louis")),
+    ("weather in Paris, TX", Location("name", "Paris, TX")),
+    ("temperature in Springfield, Illinois today", Location("name", "Springfield, Illinois")),
+    ("weather in Rio Grande", Location("name", "Rio Grande")),
+    ("weather in The Hague", Location("name", "The Hague")),
+    # left to the LLM
+    ("will it rain at 1130 PM", None),
+    ("what should I wear today", None),
+    ("weather in Tomorrow", None),
+    ("weather for My Location", None),
+    ("how cold is it at Home", None),
+    ("weather in Our City", None),
+    ("is it raining Here", None),
+])
+def test_parse_location(query, expected):
+    assert parse_location(query) == expected
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("Paris", Location("name", "Paris")),
+    ("sf", Location("name", "San Francisco")),
+    ("10001", Location("zip", "10001,US")),
+    ("51.5, -0.12", Location("coords", "51.5,-0.12", 51.5, -0.12)),
+])
+def test_classify_location(text, expected):
+    assert classify_location(text) == expected
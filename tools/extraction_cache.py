@@ -0,0 +1,289 @@
+import asyncio
+import glob
+import json
+import os
+import re
+import tempfile
+import threading
+from collections import OrderedDict
+from dataclasses import asdict
+from Schema.model import Location
+from utils.logger import logger
+
+EXTRACTION_CACHE_PATH = os.getenv("EXTRACTION_CACHE_PATH", "data/extraction_cache.json")
+EXTRACTION_CACHE_ENTRIES = int(os.getenv("EXTRACTION_CACHE_ENTRIES", "20000"))
+EXTRACTION_CACHE_SEMANTIC = os.getenv("EXTRACTION_CACHE_SEMANTIC", "0") == "1"
+EXTRACTION_CACHE_SIMILARITY = float(os.getenv("EXTRACTION_CACHE_SIMILARITY", "0.92"))
+
+# Words that never change which location a query refers to. Dropping them
+# (and ignoring word order) lets "weather in new york?" and "New York
+# weather" share one exact-match key.
+_FILLER = {
+    "a", "an", "the", "is", "it", "what", "whats", "what's", "how", "hows", "how's",
+    "in", "at", "for", "of", "on", "me", "tell", "show", "give", "please", "now",
+    "current", "currently", "right", "today", "like", "there", "weather", "temperature",
+    "temp", "forecast", "conditions", "climate", "outside",
+}
+_TOKEN = re.compile(r"[\w'.-]+")
+
+
+def normalize_query(query: str) -> str:
+    tokens = [t.strip(".'") for t in _TOKEN.findall(query.lower())]
+    return " ".join(sorted(t for t in tokens if t and t not in _FILLER))
+
+
+def _shares_tokens(a: str, b: str) -> bool:
+    # "weather in Paris" and "weather in London" embed close together; only
+    # trust a vector match that also shares most of its location words.
+    ta, tb = set(a.split()), set(b.split())
+    if not ta or not tb:
+        return False
+    return len(ta & tb) / len(ta | tb) >= 0.5
+
+
+class ExtractionCache:
+    """
+    Memo of user query -> extracted Location, in front of the LLM call.
+    Exact lookups use the normalized query text. When enabled, a FAISS
+    inner-product index over query embeddings also catches paraphrases
+    above `similarity` (cosine). LRU-bounded, persisted to `path` as JSON
+    (plus a sidecar .faiss file for the vectors, named in the JSON).
+    """
+
+    def __init__(
+        self,
+        path: str = EXTRACTION_CACHE_PATH,
+        max_entries: int = EXTRACTION_CACHE_ENTRIES,
+        semantic: bool = EXTRACTION_CACHE_SEMANTIC,
+        similarity: float = EXTRACTION_CACHE_SIMILARITY,
+    ):
+        self.path = path
+        self.max_entries = max_entries
+        self.similarity = similarity
+        self.hits = 0
+        self.semantic_hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()  # key -> (id, Location)
+        self._ids = {}                 # faiss id -> key
+        self._pending_vectors = {}     # key -> vector computed on a miss, reused by put()
+        self._next_id = 0
+        self._lock = threading.Lock()
+        self._loaded = False
+        self._semantic = semantic
+        self._embeddings = None
+        self._index = None
+
+    # ------------------------------------------------------------------
+    # setup / persistence
+    # ------------------------------------------------------------------
+    def _init_semantic(self):
+        try:
+            import faiss
+            from utils.LLM_init import init_embeddings
+        except ImportError as e:
+            logger.warning("Semantic extraction cache disabled: {}", e)
+            return
+        self._faiss = faiss
+        self._embeddings = init_embeddings()
+
+    def _new_index(self, dim: int):
+        return self._faiss.IndexIDMap2(self._faiss.IndexFlatIP(dim))
+
+    def _ensure_loaded(self):
+        if self._loaded:
+            return
+        with self._lock:
+            if self._loaded:
+                return
+            self._loaded = True
+            if self._semantic:
+                # embeddings client is built here, not at import
+                self._init_semantic()
+            if not os.path.exists(self.path):
+                return
+            try:
+                with open(self.path) as f:
+                    saved = json.load(f)
+                for key, ident, loc in saved["entries"]:
+                    self._entries[key] = (ident, Location(**loc))
+                    self._ids[ident] = key
+                self._next_id = saved.get("next_id", len(self._entries))
+                index_path = self._index_path(saved.get("index"))
+                if self._embeddings is not None and index_path and os.path.exists(index_path):
+                    self._index = self._faiss.read_index(index_path)
+                logger.info("Loaded {} extraction cache entries", len(self._entries))
+            except (OSError, ValueError, KeyError, TypeError) as e:
+                logger.warning("Ignoring unreadable extraction cache {}: {}", self.path, e)
+
+    def _index_path(self, name):
+        return os.path.join(os.path.dirname(os.path.abspath(self.path)), name) if name else None
+
+    def _saved_entries(self) -> list:
+        try:
+            with open(self.path) as f:
+                return json.load(f)["entries"]
+        except (OSError, ValueError, KeyError, TypeError):
+            return []
+
+    def preload(self):
+        """Load persisted entries now instead of on the first lookup."""
+        self._ensure_loaded()
+
+    def save(self):
+        """
+        Persist entries (and vectors) so a restart starts warm. Every worker
+        saves at shutdown, so entries another worker saved first are kept
+        (without their vectors), and both files go through unique temporary
+        names: the JSON is swapped in last and names the index matching its ids.
+        """
+        if not self._loaded:
+            return
+        with self._lock:
+            entries = [[key, ident, asdict(loc)] for key, (ident, loc) in self._entries.items()]
+            next_id = self._next_id
+            index = self._index
+        ours = {entry[0] for entry in entries}
+        others = [entry for entry in self._saved_entries() if entry[0] not in ours]
+        room = max(self.max_entries - len(entries), 0)
+        others = others[len(others) - room:] if room < len(others) else others
+        # the others are older than ours in LRU order; fresh ids keep them clear of our vectors
+        saved = {
+            "next_id": next_id + len(others),
+            "entries": [[key, next_id + i, loc] for i, (key, _, loc) in enumerate(others)] + entries,
+        }
+
+        directory = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(directory, exist_ok=True)
+        prefix = os.path.basename(self.path) + "."
+        if index is not None:
+            fd, index_path = tempfile.mkstemp(dir=directory, prefix=prefix, suffix=".faiss")
+            os.close(fd)
+            self._faiss.write_index(index, index_path)
+            saved["index"] = os.path.basename(index_path)
+        fd, tmp = tempfile.mkstemp(dir=directory, prefix=prefix, suffix=".tmp")
+        with os.fdopen(fd, "w") as f:
+            json.dump(saved, f)
+        os.replace(tmp, self.path)
+
+        # older sidecars are no longer named by the JSON; if one was still
+        # being saved by another worker, that worker's next start is just cold
+        for stale in glob.glob(os.path.join(glob.escape(directory), glob.escape(prefix) + "*.faiss")):
+            if os.path.basename(stale) != saved.get("index"):
+                try:
+                    os.remove(stale)
+                except OSError:
+                    pass
+
+    # ------------------------------------------------------------------
+    # lookups
+    # ------------------------------------------------------------------
+    def _get_exact(self, key: str):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def _search(self, key: str, vector):
+        import numpy as np
+
+        vec = np.asarray([vector], dtype="float32")
+        self._faiss.normalize_L2(vec)
+        with self._lock:
+            self._pending_vectors[key] = vec
+            if len(self._pending_vectors) > 1024:
+                self._pending_vectors.pop(next(iter(self._pending_vectors)))
+            if self._index is None or self._index.ntotal == 0:
+                return None
+            scores, ids = self._index.search(vec, 1)
+            if ids[0][0] < 0 or scores[0][0] < self.similarity:
+                return None
+            match = self._ids.get(int(ids[0][0]))
+            if match is None or match not in self._entries or not _shares_tokens(key, match):
+                return None
+            self._entries.move_to_end(match)
+            self.semantic_hits += 1
+            return self._entries[match][1]
+
+    def _record_miss(self):
+        with self._lock:
+            self.misses += 1
+
+    def get(self, query: str) -> Location | None:
+        self._ensure_loaded()
+        key = normalize_query(query)
+        if not key:
+            return None
+        location = self._get_exact(key)
+        if location is None and self._embeddings is not None:
+            try:
+                location = self._search(key, self._embeddings.embed_query(query))
+            except Exception as e:
+                logger.warning("Semantic extraction lookup failed: {}", e)
+        if location is None:
+            self._record_miss()
+        return location
+
+    async def aget(self, query: str) -> Location | None:
+        if not self._loaded:
+            await asyncio.to_thread(self._ensure_loaded)
+        key = normalize_query(query)
+        if not key:
+            return None
+        location = self._get_exact(key)
+        if location is None and self._embeddings is not None:
+            try:
+                location = self._search(key, await self._embeddings.aembed_query(query))
+            except Exception as e:
+                logger.warning("Semantic extraction lookup failed: {}", e)
+        if location is None:
+            self._record_miss()
+        return location
+
+    def put(self, query: str, location: Location):
+        self._ensure_loaded()
+        key = normalize_query(query)
+        if not key:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                return
+            ident = self._next_id
+            self._next_id += 1
+            self._entries[key] = (ident, location)
+            self._ids[ident] = key
+
+            vec = self._pending_vectors.pop(key, None)
+            if vec is not None:
+                if self._index is None:
+                    self._index = self._new_index(vec.shape[1])
+                self._index.add_with_ids(vec, self._np_ids([ident]))
+
+            while len(self._entries) > self.max_entries:
+                _, (old_id, _) = self._entries.popitem(last=False)
+                self._ids.pop(old_id, None)
+                if self._index is not None:
+                    self._index.remove_ids(self._np_ids([old_id]))
+
+    @staticmethod
+    def _np_ids(ids):
+        import numpy as np
+
+        return np.asarray(ids, dtype="int64")
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.semantic_hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "semantic_hits": self.semantic_hits,
+                "misses": self.misses,
+                "hit_ratio": (self.hits + self.semantic_hits) / lookups if lookups else 0.0,
+            }
+
+
+extraction_cache = ExtractionCache()
@@ -0,0 +1,228 @@
+"""
+Optional offline gazetteer: city names, aliases and postal-code centroids
+mapped to coordinates in one read-only file that every worker memory-maps,
+so the OS shares a single copy of the pages. Keys are Location keys
+("name:paris,fr", "zip:10001,us"), looked up by binary search over a
+fixed-width record table: a few microseconds, no network, no DB. `closest`
+finds near spellings of names (prefix scan + difflib) as a last resort.
+
+File layout (little-endian):
+  header   magic "GAZ1" | version u8 | count u32
+  records  count x (key offset u32 | lat f32 | lon f32), sorted by key
+  keys     u8 length + utf-8 bytes each, offsets relative to this section
+
+Build or refresh from a CSV with a header row
+(kind,name,country,lat,lon[,population][,aliases]; kind is "name" or
+"zip", aliases are "|"-separated):
+
+    python -m tools.gazetteer cities.csv postcodes.csv -o data/gazetteer.bin
+
+The file is replaced atomically; workers pick it up on restart.
+"""
+import argparse
+import csv
+import difflib
+import mmap
+import os
+import struct
+import sys
+import tempfile
+import threading
+from bisect import bisect_left
+from utils.helpers import normalize_location
+
+GAZETTEER_PATH = os.getenv("GAZETTEER_PATH", "data/gazetteer.bin")
+# Closest name accepted for a misspelled place (difflib ratio); 0 disables fuzzy lookup.
+GAZETTEER_FUZZY_CUTOFF = float(os.getenv("GAZETTEER_FUZZY_CUTOFF", "0.9"))
+# Fuzzy candidates are the keys sharing this many leading characters.
+GAZETTEER_FUZZY_PREFIX = 2
+
+_MAGIC = b"GAZ1"
+_VERSION = 1
+_HEADER = struct.Struct("<4sBI")
+_RECORD = struct.Struct("<Iff")
+
+
+def gazetteer_key(kind: str, value: str) -> str:
+    """Location.key, with ", " folded to "," so "Paris, FR" and "Paris,FR" match."""
+    return f"{kind}:{normalize_location(value).replace(', ', ',')}"
+
+
+class _KeyView:
+    """Sequence view of the sorted keys, so `bisect` can search the file in place."""
+
+    def __init__(self, gazetteer: "Gazetteer"):
+        self._gazetteer = gazetteer
+
+    def __len__(self):
+        return self._gazetteer.count
+
+    def __getitem__(self, index: int) -> bytes:
+        return self._gazetteer._key(index)
+
+
+class Gazetteer:
+    def __init__(self, path: str = GAZETTEER_PATH, fuzzy_cutoff: float = GAZETTEER_FUZZY_CUTOFF):
+        self.path = path
+        self.fuzzy_cutoff = fuzzy_cutoff
+        self.count = 0
+        self.hits = 0
+        self.fuzzy_hits = 0
+        self.misses = 0
+        self._mm = None
+        self._keys_base = 0
+        self._opened = False
+        self._lock = threading.Lock()
+
+    def open(self) -> bool:
+        """Map the file on first use; False (and lookups return None) if there is none."""
+        if self._opened:
+            return self._mm is not None
+        with self._lock:
+            if not self._opened:
+                try:
+                    with open(self.path, "rb") as f:
+                        mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+                except (FileNotFoundError, ValueError):
+                    mm = None  # missing or empty file
+                if mm is not None:
+                    magic, version, count = _HEADER.unpack_from(mm)
+                    if magic != _MAGIC or version != _VERSION:
+                        raise ValueError(f"{self.path} is not a gazetteer file (version {_VERSION})")
+                    self.count = count
+                    self._keys_base = _HEADER.size + count * _RECORD.size
+                    self._mm = mm
+                self._opened = True
+        return self._mm is not None
+
+    def _record(self, index: int) -> tuple[int, float, float]:
+        return _RECORD.unpack_from(self._mm, _HEADER.size + index * _RECORD.size)
+
+    def _key(self, index: int) -> bytes:
+        start = self._keys_base + self._record(index)[0]
+        return self._mm[start + 1:start + 1 + self._mm[start]]
+
+    def _find(self, key: bytes):
+        index = bisect_left(_KeyView(self), key)
+        if index < self.count and self._key(index) == key:
+            _, lat, lon = self._record(index)
+            return round(lat, 5), round(lon, 5)
+        return None
+
+    def complete(self, prefix: str, limit: int = 10) -> list[str]:
+        """Keys starting with `prefix` (e.g. "name:san "), in sorted order."""
+        if not self.open():
+            return []
+        raw = prefix.encode()
+        keys = []
+        index = bisect_left(_KeyView(self), raw)
+        while index < self.count and len(keys) < limit:
+            key = self._key(index)
+            if not key.startswith(raw):
+                break
+            keys.append(key.decode())
+            index += 1
+        return keys
+
+    def lookup(self, kind: str, value: str):
+        """(lat, lon) for a typed location, or None if the gazetteer doesn't know it."""
+        if not self.open():
+            return None
+        found = self._find(gazetteer_key(kind, value).encode())
+        if found is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return found
+
+    def closest(self, kind: str, value: str):
+        """
+        (lat, lon) of the nearest spelling of a place name (difflib ratio of
+        at least `fuzzy_cutoff`), or None. Near spellings are often other real
+        places ("bolton"/"boston"), so this is only a fallback for names the
+        network geocoder can't resolve, and its answer is never cached.
+        """
+        if kind != "name" or not self.fuzzy_cutoff or not self.open():
+            return None
+        key = gazetteer_key(kind, value)
+        head = key[:len("name:") + GAZETTEER_FUZZY_PREFIX]
+        match = difflib.get_close_matches(key, self.complete(head, limit=500), n=1, cutoff=self.fuzzy_cutoff)
+        if not match:
+            return None
+        self.fuzzy_hits += 1
+        return self._find(match[0].encode())
+
+    def stats(self) -> dict:
+        return {"entries": self.count, "hits": self.hits, "fuzzy_hits": self.fuzzy_hits, "misses": self.misses}
+
+
+gazetteer = Gazetteer()
+
+
+# ----------------------------------------------------------------------
+# Build
+# ----------------------------------------------------------------------
+def _rows_to_entries(rows) -> dict:
+    """{key: (lat, lon)}; where a name is ambiguous, the most populous place wins."""
+    best = {}  # key -> (population, lat, lon)
+
+    def add(key, population, lat, lon):
+        if key not in best or population > best[key][0]:
+            best[key] = (population, lat, lon)
+
+    for row in rows:
+        kind = (row.get("kind") or "name").strip().lower()
+        country = (row.get("country") or "").strip()
+        lat, lon = float(row["lat"]), float(row["lon"])
+        population = int(float(row.get("population") or 0))
+        names = [row["name"], *filter(None, (row.get("aliases") or "").split("|"))]
+        for name in names:
+            name = name.strip()
+            if not name:
+                continue
+            if kind == "zip":
+                add(gazetteer_key("zip", f"{name},{country.upper()}"), population, lat, lon)
+                continue
+            add(gazetteer_key("name", name), population, lat, lon)
+            if country:
+                add(gazetteer_key("name", f"{name},{country}"), population, lat, lon)
+    return {key: (lat, lon) for key, (_, lat, lon) in best.items()}
+
+
+def write_gazetteer(entries: dict, path: str):
+    """Write {key: (lat, lon)} as a gazetteer file, replacing `path` atomically."""
+    # keys longer than a u8 length can't be stored (and are never real place names)
+    items = sorted((key.encode(), coords) for key, coords in entries.items() if len(key.encode()) <= 255)
+    records, blob, offset = [], [], 0
+    for raw, (lat, lon) in items:
+        records.append(_RECORD.pack(offset, lat, lon))
+        blob.append(bytes((len(raw),)) + raw)
+        offset += 1 + len(raw)
+
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=directory, prefix=".gazetteer-")
+    with os.fdopen(fd, "wb") as f:
+        f.write(_HEADER.pack(_MAGIC, _VERSION, len(items)))
+        f.writelines(records)
+        f.writelines(blob)
+    os.replace(tmp, path)
+
+
+def build(csv_paths: list[str], output: str) -> int:
+    rows = []
+    for csv_path in csv_paths:
+        with open(csv_path, newline="", encoding="utf-8") as f:
+            rows.extend(csv.DictReader(f))
+    entries = _rows_to_entries(rows)
+    write_gazetteer(entries, output)
+    return len(entries)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("csv", nargs="+", help="CSV files: kind,name,country,lat,lon[,population][,aliases]")
+    parser.add_argument("-o", "--output", default=GAZETTEER_PATH)
+    args = parser.parse_args()
+    count = build(args.csv, args.output)
+    print(f"wrote {count} keys to {args.output}", file=sys.stderr)
@@ -0,0 +1,92 @@
+import asyncio
+import os
+import threading
+from datetime import datetime, timedelta
+from database.cache import get_geocode_cache, save_geocode_cache
+from utils.helpers import normalize_location
+
+GEOCODE_NEGATIVE_TTL = timedelta(minutes=int(os.getenv("GEOCODE_NEGATIVE_TTL_MINUTES", "15")))
+GEOCODE_MEMORY_ENTRIES = int(os.getenv("GEOCODE_MEMORY_ENTRIES", "50000"))
+
+
+class GeocodeCache:
+    """
+    Two-tier index of location string -> (lat, lon).
+    The in-process dict answers repeat lookups without I/O; the
+    `geocode_cache` table keeps them across restarts and workers.
+    Positive entries never expire (places don't move); negative entries
+    ((None, None)) expire after `negative_ttl` so a fixed geocoder can recover.
+    """
+
+    def __init__(self, negative_ttl: timedelta = GEOCODE_NEGATIVE_TTL, max_entries: int = GEOCODE_MEMORY_ENTRIES):
+        self.negative_ttl = negative_ttl
+        self.max_entries = max_entries
+        self.hits = 0
+        self.negative_hits = 0  # geocoder calls skipped for known-unresolvable strings
+        self.misses = 0
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def _get_local(self, key: str):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            ts, lat, lon = entry
+            if lat is None and datetime.now() - ts >= self.negative_ttl:
+                del self._entries[key]
+                return None
+            return lat, lon
+
+    def _put_local(self, key: str, lat, lon, ts: datetime):
+        with self._lock:
+            if key not in self._entries and len(self._entries) >= self.max_entries:
+                # Oldest insertion first; cheap bound without LRU bookkeeping.
+                self._entries.pop(next(iter(self._entries)))
+            self._entries[key] = (ts, lat, lon)
+
+    def _load(self, key: str):
+        row = get_geocode_cache(key)
+        if row is None:
+            return None
+        ts = row["timestamp"]
+        if row["lat"] is None and datetime.now() - ts >= self.negative_ttl:
+            return None
+        self._put_local(key, row["lat"], row["lon"], ts)
+        return row["lat"], row["lon"]
+
+    def _count(self, found):
+        if found is None:
+            self.misses += 1
+        elif found[0] is None:
+            self.negative_hits += 1
+        else:
+            self.hits += 1
+        return found
+
+    def get(self, location: str):
+        """Return (lat, lon), (None, None) for a known miss, or None if unknown."""
+        key = normalize_location(location)
+        return self._count(self._get_local(key) or self._load(key))
+
+    async def aget(self, location: str):
+        key = normalize_location(location)
+        return self._count(self._get_local(key) or await asyncio.to_thread(self._load, key))
+
+    def put(self, location: str, lat, lon):
+        key = normalize_location(location)
+        self._put_local(key, lat, lon, datetime.now())
+        save_geocode_cache(key, lat, lon)
+
+    async def aput(self, location: str, lat, lon):
+        key = normalize_location(location)
+        self._put_local(key, lat, lon, datetime.now())
+        await asyncio.to_thread(save_geocode_cache, key, lat, lon)
+
+    def stats(self) -> dict:
+        with self._lock:
+            entries = len(self._entries)
+        return {"entries": entries, "hits": self.hits, "negative_hits": self.negative_hits, "misses": self.misses}
+
+
+geocode_cache = GeocodeCache()
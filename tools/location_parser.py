@@ -0,0 +1,213 @@
+"""
+Deterministic location extraction that runs before the LLM.
+Handles the shapes that make up most traffic (coordinates, postal codes,
+well-known aliases, "weather in <Capitalized Name>") without a model call.
+Anything it is not sure about returns None and falls through to the LLM.
+"""
+import re
+from Schema.model import Location
+
+# Common short forms -> the name the geocoder resolves best.
+LOCATION_ALIASES = {
+    "nyc": "New York",
+    "ny": "New York",
+    "new york city": "New York",
+    "la": "Los Angeles",
+    "sf": "San Francisco",
+    "san fran": "San Francisco",
+    "dc": "Washington",
+    "washington dc": "Washington",
+    "philly": "Philadelphia",
+    "vegas": "Las Vegas",
+    "chi-town": "Chicago",
+    "delhi ncr": "Delhi",
+    "ncr": "Delhi",
+    "new delhi": "New Delhi",
+    "bombay": "Mumbai",
+    "calcutta": "Kolkata",
+    "madras": "Chennai",
+    "bangalore": "Bengaluru",
+    "blr": "Bengaluru",
+    "hyd": "Hyderabad",
+    "pink city": "Jaipur",
+    "ldn": "London",
+    "hk": "Hong Kong",
+    "kl": "Kuala Lumpur",
+    "rio": "Rio de Janeiro",
+    "cdmx": "Mexico City",
+    "saint petersburg": "St Petersburg",
+}
+
+# Two-letter aliases collide with ordinary words ("la", "ny"), so they only
+# count when written in upper case.
+_SHORT_ALIAS_MAX = 2
+
+_ALIAS_PATTERN = re.compile(
+    r"(?<![\w-])(" + "|".join(re.escape(a) for a in sorted(LOCATION_ALIASES, key=len, reverse=True)) + r")(?![\w-])",
+    re.IGNORECASE,
+)
+
+_DECIMAL_COORDS = re.compile(
+    r"(?<![\w.])([-+]?\d{1,2}(?:\.\d+)?)\s*°?\s*([NS])?\s*[,;/ ]\s*([-+]?\d{1,3}(?:\.\d+)?)\s*°?\s*([EW])?(?![\w.])",
+    re.IGNORECASE,
+)
+_DMS_PART = re.compile(
+    r"(\d{1,3})\s*°\s*(?:(\d{1,2})\s*['′]\s*)?(?:(\d{1,2}(?:\.\d+)?)\s*[\"″]\s*)?([NSEW])",
+    re.IGNORECASE,
+)
+
+# (pattern, country code, normalizer) in priority order. Formats that
+# overlap (e.g. five digits in the US, DE and FR) go to the most common
+# market; an explicit "<code>, <CC>" suffix always wins.
+_POSTAL_PATTERNS = [
+    (re.compile(r"\b(\d{5})-\d{4}\b"), "US", None),
+    (re.compile(r"\b(\d{5}-\d{3})\b"), "BR", None),
+    (re.compile(r"\b(\d{3}-\d{4})\b"), "JP", None),
+    (re.compile(r"\b([A-Z]{1,2}\d[A-Z\d]?)\s?\d[A-Z]{2}\b"), "GB", None),
+    (re.compile(r"\b([A-Z]\d[A-Z])\s?\d[A-Z]\d\b"), "CA", None),
+    # case-sensitive; no leading 0, and never SA/SD/SS (unused) or AM/PM (clock times)
+    (re.compile(r"\b([1-9]\d{3}\s?(?!SA|SD|SS|AM|PM)[A-Z]{2})\b"), "NL", lambda code: code.replace(" ", "")),
+    (re.compile(r"\b([1-9]\d{5})\b"), "IN", None),
+    (re.compile(r"\b(\d{5})\b"), "US", None),
+]
+_EXPLICIT_POSTAL = re.compile(r"\b([A-Z\d]{2,10}(?:[ -][A-Z\d]{2,4})?)\s*,\s*([A-Z]{2})\b", re.IGNORECASE)
+
+# "weather in Paris", "temp at San Jose", "forecast for Rio de Janeiro",
+# "in St. Louis", "in Paris, TX". "near" is left to the LLM: it usually
+# introduces a landmark, not a city.
+_PLACE_WORD = r"(?:(?:St|Ste|Mt|Ft)\.|[A-Z][\w'-]*)"
+_NAMED_PLACE = re.compile(
+    rf"\b(?:in|at|for|of)\s+({_PLACE_WORD}(?:\s+(?:(?:de|del|da|do|la|le|upon|on)\s+)?{_PLACE_WORD})*"
+    r"(?:,\s*[A-Z][\w'-]*)?)"
+)
+# Lowercase words that may join a name ("Rio de Janeiro") but never end one.
+_CONNECTIVES = {"de", "del", "da", "do", "la", "le", "upon", "on"}
+# "for My Location", "at Home": the user's own place, which only the LLM
+# (or the session) can resolve.
+_NOT_NAMES = {"my", "our", "your", "his", "her", "their", "home", "here", "there", "this", "that", "current"}
+_NOT_PLACES = {
+    "Celsius", "Fahrenheit", "Kelvin", "Today", "Tonight", "Tomorrow", "Morning", "Evening",
+    "January", "February", "March", "April", "May", "June", "July", "August",
+    "September", "October", "November", "December",
+    "Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday",
+}
+
+
+def _coords(lat: float, lon: float) -> Location | None:
+    if not (-90 <= lat <= 90 and -180 <= lon <= 180):
+        return None
+    lat, lon = round(lat, 4), round(lon, 4)
+    return Location("coords", f"{lat},{lon}", lat, lon)
+
+
+def _parse_dms(query: str) -> Location | None:
+    lat = lon = None
+    for deg, minutes, seconds, hemi in _DMS_PART.findall(query):
+        value = float(deg) + float(minutes or 0) / 60 + float(seconds or 0) / 3600
+        hemi = hemi.upper()
+        if hemi in "SW":
+            value = -value
+        if hemi in "NS":
+            lat = value
+        else:
+            lon = value
+    if lat is None or lon is None:
+        return None
+    return _coords(lat, lon)
+
+
+def _parse_decimal(query: str) -> Location | None:
+    for lat_s, lat_h, lon_s, lon_h in _DECIMAL_COORDS.findall(query):
+        # Require a decimal point or hemisphere so "10001 2" isn't read as coordinates.
+        if "." not in lat_s + lon_s and not (lat_h and lon_h):
+            continue
+        lat, lon = float(lat_s), float(lon_s)
+        if lat_h.upper() == "S":
+            lat = -abs(lat)
+        if lon_h.upper() == "W":
+            lon = -abs(lon)
+        location = _coords(lat, lon)
+        if location:
+            return location
+    return None
+
+
+def _parse_explicit_postal(query: str) -> Location | None:
+    for match in _EXPLICIT_POSTAL.finditer(query):
+        code = match.group(1).upper()
+        if any(ch.isdigit() for ch in code):
+            return Location("zip", f"{code},{match.group(2).upper()}")
+    return None
+
+
+def _parse_bare_postal(query: str) -> Location | None:
+    for pattern, country, normalize in _POSTAL_PATTERNS:
+        match = pattern.search(query.upper() if country in ("GB", "CA") else query)
+        if match:
+            code = match.group(1)
+            if normalize:
+                code = normalize(code)
+            return Location("zip", f"{code},{country}")
+    return None
+
+
+def _parse_postal(query: str) -> Location | None:
+    return _parse_explicit_postal(query) or _parse_bare_postal(query)
+
+
+def _parse_alias(query: str) -> Location | None:
+    for match in _ALIAS_PATTERN.finditer(query):
+        alias = match.group(1)
+        if len(alias) <= _SHORT_ALIAS_MAX and not alias.isupper():
+            continue
+        following = re.match(r"\s+([A-Z][\w'-]*)", query[match.end():])
+        if following and following.group(1) not in _NOT_PLACES:
+            # part of a longer name ("Rio Grande"), not the alias
+            continue
+        return Location("name", LOCATION_ALIASES[alias.lower()])
+    return None
+
+
+def _parse_named_place(query: str) -> Location | None:
+    match = _NAMED_PLACE.search(query)
+    if not match:
+        return None
+    words = []
+    for word in match.group(1).split():
+        # a word with a digit is a postcode ("in SW1A 1AA") or a time, and
+        # "Friday"/"Celsius" end the name ("in London on Friday")
+        if any(ch.isdigit() for ch in word) or word.rstrip(",") in _NOT_PLACES:
+            break
+        words.append(word)
+    while words and words[-1] in _CONNECTIVES:
+        words.pop()
+    if not words or words[0].lower() in _NOT_NAMES:
+        return None
+    return Location("name", " ".join(words).rstrip(","))
+
+
+def parse_location(query: str) -> Location | None:
+    """
+    Extract a typed location from a raw user query, or None if unsure.
+    A named place beats a bare number-like postal match ("in Delhi at 1130",
+    "in Paris 75001"); an explicit "<code>, <CC>" beats both.
+    """
+    return (
+        _parse_dms(query)
+        or _parse_decimal(query)
+        or _parse_alias(query)
+        or _parse_explicit_postal(query)
+        or _parse_named_place(query)
+        or _parse_bare_postal(query)
+    )
+
+
+def classify_location(text: str) -> Location:
+    """Type a bare location string (e.g. the LLM's answer)."""
+    text = text.strip()
+    return (
+        _parse_dms(text)
+        or _parse_decimal(text)
+        or _parse_postal(text)
+        or Location("name", LOCATION_ALIASES.get(text.lower(), text))
+    )
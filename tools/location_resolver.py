@@ -1,55 +1,133 @@
-from langchain.prompts import ChatPromptTemplate
+import os
+from datetime import timedelta
+from Schema.model import Location, QueryExtraction, ResolvedQuery
+from classifiers.intent_classifire import get_query_extractor, local_units, local_time_ref
+from tools.location_parser import parse_location, classify_location
+from tools.extraction_cache import extraction_cache, normalize_query
+from utils.negative_cache import NegativeCache
+from utils.metrics import track_upstream
+from utils.upstream import llm_upstream, UpstreamUnavailable
 from utils.logger import logger
 
-def resolve_location(query: str, llm) -> str | None:
+# Queries the LLM found no location in (value: their intent); repeats skip
+# the LLM until this expires.
+EXTRACTION_NEGATIVE_TTL = timedelta(seconds=int(os.getenv("EXTRACTION_NEGATIVE_TTL_SECONDS", "600")))
+EXTRACTION_NEGATIVE_ENTRIES = int(os.getenv("EXTRACTION_NEGATIVE_ENTRIES", "10000"))
+
+failed_extractions = NegativeCache(EXTRACTION_NEGATIVE_TTL, EXTRACTION_NEGATIVE_ENTRIES)
+
+
+def resolve_query(query: str, llm) -> ResolvedQuery:
     """
-    Uses an LLM to extract the location from user query.
+    Intent, location, units and time reference for a user query.
     Supports:
     - City names (e.g., "New York", "Delhi NCR")
     - Postal codes (e.g., "10001")
     - Coordinates (e.g., "40.7128, -74.0060")
 
-    Returns a normalized string that can be used by the Weather API.
+    Obvious shapes are parsed locally (and assumed to be weather queries);
+    the rest take one structured LLM call that classifies and extracts.
+    Raises `UpstreamUnavailable` if that call can't be made right now.
     """
+    location = parse_location(query)
+    if location:
+        logger.info("Extracted location locally: {}", location)
+        return _weather_query(query, location)
 
-    prompt = ChatPromptTemplate.from_template(
-        """
-        You are a location extraction assistant for a weather application.
-
-        Your task is to analyze the following user query and extract the location information in a format suitable for weather lookup:
-        "{query}"
-
-        Extraction guidelines:
-        - If the query contains coordinates (latitude and longitude), return them in "lat,long" format. Accept both decimal and DMS formats, and handle negative values.
-        - If the query contains a postal code, return only the postal code (digits and/or letters). Accept international formats, including ZIP, PIN, and alphanumeric codes.
-        - If the query contains a city or region name, return only the clean name of the city or region, without any extra words. Remove any prefixes/suffixes like "city of", "near", "in", etc.
-        - If the query contains multiple locations, return only the most relevant one for weather lookup.
-        - Ignore any references to time, weather conditions, or unrelated entities.
-        - Do not include any additional words such as "weather", "forecast", "temperature", or explanations.
-        - Do not add punctuation, explanations, or any extra text.
-        - If no location can be identified in the query, return "UNKNOWN".
-        - If the query contains ambiguous or conflicting locations, return "UNKNOWN".
-        - If the query contains a landmark or place name (e.g., "Eiffel Tower"), return the city or region where it is located.
-        - If the query contains a country name, return only if no more specific location is present.
-
-        Your response must be only the extracted location or "UNKNOWN".
-        """
-    )
+    key = normalize_query(query)
+    # an all-filler query normalizes to "", which would stand for every such query
+    intent = failed_extractions.get(key) if key else None
+    if intent:
+        logger.info("Skipping LLM: query recently had no location")
+        return ResolvedQuery(intent, None)
+
+    location = extraction_cache.get(query)
+    if location:
+        logger.info("Extracted location from cache: {}", location)
+        return _weather_query(query, location)
 
     try:
-        response = llm.invoke(prompt.format(query=query))
-        location = response.content.strip()
+        extraction = llm_upstream.call(_extract, llm, query)
+    except UpstreamUnavailable:
+        raise  # breaker open / quota spent: the caller answers "temporarily unavailable"
+    except Exception as e:
+        logger.error("Query extraction failed: {}", e)
+        return ResolvedQuery("weather", None)
+    return _from_extraction(query, key, extraction)
+
 
-        # Final cleanup
-        location = location.replace("?", "").replace(".", "").strip()
+async def aresolve_query(query: str, llm) -> ResolvedQuery:
+    """Async variant of `resolve_query`; awaits the LLM instead of blocking a worker."""
+    location = parse_location(query)
+    if location:
+        logger.info("Extracted location locally: {}", location)
+        return _weather_query(query, location)
 
-        if location.upper() == "UNKNOWN":
-            logger.warning("❌ Could not detect location.")
-            return None
+    key = normalize_query(query)
+    intent = failed_extractions.get(key) if key else None
+    if intent:
+        logger.info("Skipping LLM: query recently had no location")
+        return ResolvedQuery(intent, None)
 
-        logger.info(f"Extracted location via LLM: {location}")
-        return location
+    location = await extraction_cache.aget(query)
+    if location:
+        logger.info("Extracted location from cache: {}", location)
+        return _weather_query(query, location)
 
+    try:
+        extraction = await llm_upstream.acall(_aextract, llm, query)
+    except UpstreamUnavailable:
+        raise  # breaker open / quota spent: the caller answers "temporarily unavailable"
     except Exception as e:
-        logger.error(f"Location resolver failed: {e}")
+        logger.error("Query extraction failed: {}", e)
+        return ResolvedQuery("weather", None)
+    return _from_extraction(query, key, extraction)
+
+
+def _extract(llm, query: str) -> QueryExtraction:
+    with track_upstream("llm", "extract"):
+        return get_query_extractor(llm).invoke({"query": query})
+
+
+async def _aextract(llm, query: str) -> QueryExtraction:
+    with track_upstream("llm", "extract"):
+        return await get_query_extractor(llm).ainvoke({"query": query})
+
+
+def resolve_location(query: str, llm) -> Location | None:
+    return resolve_query(query, llm).location
+
+
+async def aresolve_location(query: str, llm) -> Location | None:
+    return (await aresolve_query(query, llm)).location
+
+
+def _weather_query(query: str, location: Location) -> ResolvedQuery:
+    return ResolvedQuery("weather", location, local_units(query), local_time_ref(query))
+
+
+def _from_extraction(query: str, key: str, extraction: QueryExtraction) -> ResolvedQuery:
+    location = None
+    if extraction.intent == "weather":
+        location = _clean_location(extraction.location, extraction.location_type)
+    if location:
+        extraction_cache.put(query, location)
+    elif key:
+        failed_extractions.add(key, extraction.intent)
+    logger.info("Extracted via LLM: intent={} location={}", extraction.intent, location)
+    return ResolvedQuery(extraction.intent, location, extraction.units, extraction.time_ref)
+
+
+def _clean_location(text: str | None, location_type: str | None) -> Location | None:
+    # Final cleanup; keep inner dots so decimal coordinates survive
+    text = (text or "").strip().strip("\"'`").rstrip("?.!").strip()
+
+    if not text or text.upper() == "UNKNOWN":
+        logger.warning("❌ Could not detect location.")
         return None
+
+    location = classify_location(text)
+    if location.kind == "name" and location_type == "zip":
+        # a postal format the local patterns don't know
+        location = Location("zip", text)
+    return location
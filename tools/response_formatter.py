@@ -1,32 +1,130 @@
+import os
+from langchain.prompts import ChatPromptTemplate
+from utils.helpers import celsius_to_fahrenheit, ms_to_mph
 from utils.logger import logger
+from utils.metrics import track_upstream
+from utils.upstream import llm_upstream
 
-def format_response(user_query, data, llm):
+# "template" formats locally; "llm" asks the model for a conversational
+# answer (streamed token-by-token on /weather/stream).
+RESPONSE_FORMATTER = os.getenv("RESPONSE_FORMATTER", "template")
+
+ANSWER_PROMPT = ChatPromptTemplate.from_template(
+    """
+    You are a friendly weather assistant. Answer the user's question in two or
+    three short sentences using only the current conditions below.
+
+    Question: "{query}"
+    Location: {city}
+    Temperature: {temperature}{temp_unit}
+    Condition: {condition}
+    Humidity: {humidity}%
+    Wind speed: {wind_speed} {wind_unit}
     """
-    Format the OpenWeather API response into a human-readable message.
+)
+
+def _fields(data, units="metric"):
+    # Snapshots are always fetched in metric so one cache entry serves both.
+    def value(field, default="N/A", convert=None):
+        found = getattr(data, field)
+        if found is None:
+            return default
+        return convert(found) if convert and units == "imperial" else found
+
+    return {
+        "temperature": value("temp", convert=celsius_to_fahrenheit),
+        "condition": value("description"),
+        "humidity": value("humidity"),
+        "wind_speed": value("wind_speed", convert=ms_to_mph),
+        "city": value("name", "your location"),
+        "temp_unit": "°F" if units == "imperial" else "°C",
+        "wind_unit": "mph" if units == "imperial" else "m/s",
+    }
+
+
+async def aformat_response_llm(user_query, data, llm, units="metric"):
+    """
+    Let the LLM phrase the answer. Runs inside the format_answer node, so
+    LangGraph's "messages" stream sees its tokens as they arrive.
     """
     try:
-        main = data.get("main", {})
-        weather_list = data.get("weather", [{}])
-        wind = data.get("wind", {})
+        response = await llm_upstream.acall(_ainvoke, llm, ANSWER_PROMPT.format(query=user_query, **_fields(data, units)))
+        return response.content.strip()
+    except Exception as e:
+        logger.error("LLM formatter failed, using template: {}", e)
+        return format_response(user_query, data, llm, units)
+
 
-        temperature = main.get("temp", "N/A")
-        condition = weather_list[0].get("description", "N/A")
-        humidity = main.get("humidity", "N/A")
-        wind_speed = wind.get("speed", "N/A")
+def stale_notice(age_seconds: int) -> str:
+    """Age marker appended to answers served from old cache while the weather service is down."""
+    minutes = max(1, round(age_seconds / 60))
+    age = f"{minutes} minute{'s' if minutes != 1 else ''}" if minutes < 90 else f"{round(minutes / 60)} hours"
+    return f"(Live weather is temporarily unavailable; this reading is from about {age} ago.)"
 
-        city_name = data.get("name", "your location")
+
+async def _ainvoke(llm, prompt):
+    with track_upstream("llm", "format"):
+        return await llm.ainvoke(prompt)
+
+
+def format_response(user_query, data, llm, units="metric"):
+    """
+    Format a WeatherSnapshot into a human-readable message.
+    """
+    try:
+        fields = _fields(data, units)
+        temperature = fields["temperature"]
+        condition = fields["condition"]
+        humidity = fields["humidity"]
+        wind_speed = fields["wind_speed"]
+        city_name = fields["city"]
+        temp_unit = fields["temp_unit"]
+        wind_unit = fields["wind_unit"]
 
         response = f"""
 Hey there! 👋
 
 Current weather in {city_name}:
 
-* Temperature: {temperature}°C 🌡️
+* Temperature: {temperature}{temp_unit} 🌡️
 * Condition: {condition} ☀️/☁️/🌧️
 * Humidity: {humidity}% 💧
-* Wind Speed: {wind_speed} m/s 💨
+* Wind Speed: {wind_speed} {wind_unit} 💨
 """
 
         return response.strip()
     except Exception as e:
         return f"Could not format weather data: {e}"
+
+
+_WINDOW_LABELS = {
+    "today": "Rest of today", "tonight": "Tonight", "tomorrow": "Tomorrow",
+    "weekend": "This weekend", "later": "Next 12 hours",
+}
+
+
+def format_forecast(data, window, units="metric", time_ref="later"):
+    """
+    Format a ForecastWindow (aggregated from a cached ForecastSeries) into a
+    human-readable message.
+    """
+    imperial = units == "imperial"
+    temp = celsius_to_fahrenheit if imperial else (lambda c: c)
+    temp_unit = "°F" if imperial else "°C"
+    wind = ms_to_mph(window.wind_max) if imperial else window.wind_max
+    wind_unit = "mph" if imperial else "m/s"
+    precipitation = f"{round(window.pop_max * 100)}% chance"
+    if window.precip_mm:
+        precipitation += f", about {window.precip_mm} mm"
+    label = _WINDOW_LABELS.get(time_ref, "Forecast")
+    city_name = data.name or "your location"
+
+    response = f"""
+{label} in {city_name}:
+
+* Temperature: {temp(window.temp_min)}–{temp(window.temp_max)}{temp_unit} 🌡️
+* Condition: mostly {window.description} ☀️/☁️/🌧️
+* Precipitation: {precipitation} 💧
+* Wind: up to {wind} {wind_unit} 💨
+"""
+    return response.strip()
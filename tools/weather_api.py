@@ -1,51 +1,222 @@
 import os
-import requests
+import httpx
 from dotenv import load_dotenv
+from utils.http_client import get_async_client, get_sync_client
+from tools.geocode_cache import geocode_cache
+from tools.gazetteer import gazetteer
+from tools.location_parser import classify_location
+from Schema.model import Location
+from utils.singleflight import SingleFlight, AsyncSingleFlight
+from utils.metrics import track_upstream
+from utils.upstream import openweather, UpstreamUnavailable
 
 load_dotenv()
-OPENWEATHER_API_KEY = os.getenv("OPENWEATHER_API_KEY")
+API_KEY = os.getenv("OPENWEATHER_API_KEY")
 
-import requests
-import os
+# All endpoints share one host, so a single pooled connection serves geocoding
+# and weather calls alike. Overridable to point at a local stub (benchmarks).
+OPENWEATHER_BASE_URL = os.getenv("OPENWEATHER_BASE_URL", "https://api.openweathermap.org").rstrip("/")
+GEO_DIRECT_URL = f"{OPENWEATHER_BASE_URL}/geo/1.0/direct"
+GEO_ZIP_URL = f"{OPENWEATHER_BASE_URL}/geo/1.0/zip"
+WEATHER_URL = f"{OPENWEATHER_BASE_URL}/data/2.5/weather"
+FORECAST_URL = f"{OPENWEATHER_BASE_URL}/data/2.5/forecast"
 
-API_KEY = os.getenv("OPENWEATHER_API_KEY")
+# One geocode request per location key at a time, per code path.
+_geocode_flight = SingleFlight()
+_ageocode_flight = AsyncSingleFlight()
 
-def get_coordinates(location: str):
-    """Use OpenWeather Geocoding API to get latitude and longitude for a location string."""
-    url = "http://api.openweathermap.org/geo/1.0/direct"
-    params = {
-        "q": location,
-        "limit": 1,   
-        "appid": API_KEY
-    }
-    response = requests.get(url, params=params)
-    response.raise_for_status()
-    data = response.json()
-    
-    if not data:
-        raise ValueError(f"Could not find coordinates for location: {location}")
-    
-    return data[0]["lat"], data[0]["lon"]
-
-def fetch_weather(location: str):
-    """Fetch current weather for a location string using coordinates."""
-    try:
-        lat, lon = get_coordinates(location)
-    except ValueError as e:
-        return {"error": str(e)}
-    
-    url = "https://api.openweathermap.org/data/2.5/weather"
-    params = {
-        "lat": lat,
-        "lon": lon,
-        "appid": API_KEY,
-        "units": "metric"
-    }
-    response = requests.get(url, params=params)
+
+def _direct_params(location: str) -> dict:
+    return {"q": location, "limit": 1, "appid": API_KEY}
+
+
+def _zip_params(location: str) -> dict:
+    return {"zip": location, "appid": API_KEY}
+
+
+def _weather_params(lat: float, lon: float) -> dict:
+    return {"lat": lat, "lon": lon, "appid": API_KEY, "units": "metric"}
+
+
+def _parse_direct(data):
+    if isinstance(data, list) and data:
+        return data[0]["lat"], data[0]["lon"]
+    return None
+
+
+def _parse_zip(data):
+    if isinstance(data, dict) and "lat" in data and "lon" in data:
+        return data["lat"], data["lon"]
+    return None
+
+
+def _zip_json(response):
+    # 404 means "no such postal code"; anything else non-2xx is a real failure
+    # and must not be remembered as a negative geocode entry.
+    if response.status_code == 404:
+        return {}
     response.raise_for_status()
     return response.json()
 
 
-user_input = "newyork"  
-weather_data = fetch_weather(user_input)
-print(weather_data)
+def get_coordinates(location: Location):
+    """
+    Resolve a typed location to latitude/longitude: the local gazetteer
+    first (common places, no I/O), then the geocode cache, then OpenWeather.
+    Only when OpenWeather has no answer (or is unavailable) is a fuzzy
+    gazetteer match used, and it is never cached as the place's coordinates.
+    """
+    if location.kind == "coords":
+        return location.lat, location.lon
+
+    known = gazetteer.lookup(location.kind, location.value)
+    if known is not None:
+        return known
+    cached = geocode_cache.get(location.key)
+    if cached is not None:
+        return cached if cached[0] is not None else _near_match(location)
+    return _geocode_flight.do(location.key, _geocode_and_store, location)
+
+
+async def aget_coordinates(location: Location):
+    """Async variant of `get_coordinates`."""
+    if location.kind == "coords":
+        return location.lat, location.lon
+
+    known = gazetteer.lookup(location.kind, location.value)
+    if known is not None:
+        return known
+    cached = await geocode_cache.aget(location.key)
+    if cached is not None:
+        return cached if cached[0] is not None else _near_match(location)
+    return await _ageocode_flight.do(location.key, _ageocode_and_store, location)
+
+
+def _near_match(location: Location):
+    """A known place spelled almost like `location`, or (None, None); a guess, so never cached."""
+    return gazetteer.closest(location.kind, location.value) or (None, None)
+
+
+def _geocode_and_store(location: Location):
+    try:
+        lat, lon = openweather.call(_geocode, location)
+    except (UpstreamUnavailable, httpx.HTTPError):
+        near = gazetteer.closest(location.kind, location.value)
+        if near is None:
+            raise
+        return near
+    geocode_cache.put(location.key, lat, lon)
+    return (lat, lon) if lat is not None else _near_match(location)
+
+
+async def _ageocode_and_store(location: Location):
+    try:
+        lat, lon = await openweather.acall(_ageocode, location)
+    except (UpstreamUnavailable, httpx.HTTPError):
+        near = gazetteer.closest(location.kind, location.value)
+        if near is None:
+            raise
+        return near
+    await geocode_cache.aput(location.key, lat, lon)
+    return (lat, lon) if lat is not None else _near_match(location)
+
+
+def _geocode(location: Location):
+    """Resolve a name or postal code using the matching OpenWeather Geocoding endpoint."""
+    client = get_sync_client()
+
+    if location.kind == "zip":
+        with track_upstream("openweather", "geocode_zip"):
+            response = client.get(GEO_ZIP_URL, params=_zip_params(location.value))
+            return _parse_zip(_zip_json(response)) or (None, None)
+
+    with track_upstream("openweather", "geocode_direct"):
+        response = client.get(GEO_DIRECT_URL, params=_direct_params(location.value))
+        response.raise_for_status()
+        return _parse_direct(response.json()) or (None, None)
+
+
+async def _ageocode(location: Location):
+    client = get_async_client()
+
+    if location.kind == "zip":
+        with track_upstream("openweather", "geocode_zip"):
+            response = await client.get(GEO_ZIP_URL, params=_zip_params(location.value))
+            return _parse_zip(_zip_json(response)) or (None, None)
+
+    with track_upstream("openweather", "geocode_direct"):
+        response = await client.get(GEO_DIRECT_URL, params=_direct_params(location.value))
+        response.raise_for_status()
+        return _parse_direct(response.json()) or (None, None)
+
+
+def fetch_weather_at(lat: float, lon: float):
+    """
+    Fetch current weather for coordinates, within the OpenWeather quota and
+    retry policy. Raises `UpstreamUnavailable` without calling out while
+    the circuit is open or the quota is exhausted.
+    """
+    return openweather.call(_fetch_weather_at, lat, lon)
+
+
+async def afetch_weather_at(lat: float, lon: float):
+    """Async variant of `fetch_weather_at`."""
+    return await openweather.acall(_afetch_weather_at, lat, lon)
+
+
+def _fetch_weather_at(lat: float, lon: float):
+    with track_upstream("openweather", "current"):
+        response = get_sync_client().get(WEATHER_URL, params=_weather_params(lat, lon))
+        response.raise_for_status()
+        return response.json()
+
+
+async def _afetch_weather_at(lat: float, lon: float):
+    with track_upstream("openweather", "current"):
+        response = await get_async_client().get(WEATHER_URL, params=_weather_params(lat, lon))
+        response.raise_for_status()
+        return response.json()
+
+
+def fetch_forecast_at(lat: float, lon: float):
+    """Fetch the 5-day/3-hour forecast for coordinates (same quota and retry policy)."""
+    return openweather.call(_fetch_forecast_at, lat, lon)
+
+
+async def afetch_forecast_at(lat: float, lon: float):
+    """Async variant of `fetch_forecast_at`."""
+    return await openweather.acall(_afetch_forecast_at, lat, lon)
+
+
+def _fetch_forecast_at(lat: float, lon: float):
+    with track_upstream("openweather", "forecast"):
+        response = get_sync_client().get(FORECAST_URL, params=_weather_params(lat, lon))
+        response.raise_for_status()
+        return response.json()
+
+
+async def _afetch_forecast_at(lat: float, lon: float):
+    with track_upstream("openweather", "forecast"):
+        response = await get_async_client().get(FORECAST_URL, params=_weather_params(lat, lon))
+        response.raise_for_status()
+        return response.json()
+
+
+def fetch_weather(location: Location):
+    """Fetch current weather for a typed location using coordinates."""
+    lat, lon = get_coordinates(location)
+    if lat is None or lon is None:
+        return {"error": f"Could not resolve location: {location}"}
+    return fetch_weather_at(lat, lon)
+
+
+async def afetch_weather(location: Location):
+    """Async variant of `fetch_weather` using the shared async client."""
+    lat, lon = await aget_coordinates(location)
+    if lat is None or lon is None:
+        return {"error": f"Could not resolve location: {location}"}
+    return await afetch_weather_at(lat, lon)
+
+
+if __name__ == "__main__":
+    print(fetch_weather(classify_location("newyork")))
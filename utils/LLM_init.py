@@ -1,7 +1,36 @@
 from dotenv import load_dotenv
 import os
-from langchain.chat_models import init_chat_model
 
 load_dotenv()
-llm = init_chat_model("google_genai:gemini-2.0-flash", temperature=0.7, model_kwargs={"streaming": True})
 
+LLM_MODEL = os.getenv("LLM_MODEL", "google_genai:gemini-2.0-flash")
+# Per-call timeout; retries are left to utils.upstream so they share its
+# quota and circuit breaker.
+LLM_TIMEOUT = float(os.getenv("LLM_TIMEOUT", "20"))
+
+_llm = None
+
+
+def get_llm():
+    """Chat model, created on first use so importing the app stays cheap."""
+    global _llm
+    if _llm is None:
+        from langchain.chat_models import init_chat_model
+
+        _llm = init_chat_model(
+            LLM_MODEL, temperature=0.7, timeout=LLM_TIMEOUT, max_retries=0, model_kwargs={"streaming": True}
+        )
+    return _llm
+
+
+def set_llm(llm):
+    """Use `llm` instead of the configured model (e.g. a fake one in benchmarks)."""
+    global _llm
+    _llm = llm
+
+
+def init_embeddings():
+    """Embedding model for the semantic extraction cache; built only when that cache is enabled."""
+    from langchain_google_genai import GoogleGenerativeAIEmbeddings
+
+    return GoogleGenerativeAIEmbeddings(model=os.getenv("EMBEDDING_MODEL", "models/text-embedding-004"))
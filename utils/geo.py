@@ -0,0 +1,67 @@
+import os
+
+# Weather is cached per spatial cell rather than per location string, so
+# "NYC", "New York" and "10001" (and nearby coordinates) share one entry.
+#   grid:    lat/lon rounded to WEATHER_CACHE_PRECISION decimals (2 ~ 1.1 km)
+#   geohash: geohash of WEATHER_CACHE_PRECISION chars (6 ~ 1.2 x 0.6 km)
+WEATHER_CACHE_KEY = os.getenv("WEATHER_CACHE_KEY", "grid")
+WEATHER_CACHE_PRECISION = int(os.getenv("WEATHER_CACHE_PRECISION", "2" if WEATHER_CACHE_KEY == "grid" else "6"))
+
+_BASE32 = "0123456789bcdefghjkmnpqrstuvwxyz"
+
+
+def geohash_encode(lat: float, lon: float, precision: int = 6) -> str:
+    lat_lo, lat_hi, lon_lo, lon_hi = -90.0, 90.0, -180.0, 180.0
+    chars, bits, ch, even = [], 0, 0, True
+    while len(chars) < precision:
+        if even:
+            mid = (lon_lo + lon_hi) / 2
+            if lon >= mid:
+                ch, lon_lo = (ch << 1) | 1, mid
+            else:
+                ch, lon_hi = ch << 1, mid
+        else:
+            mid = (lat_lo + lat_hi) / 2
+            if lat >= mid:
+                ch, lat_lo = (ch << 1) | 1, mid
+            else:
+                ch, lat_hi = ch << 1, mid
+        even = not even
+        bits += 1
+        if bits == 5:
+            chars.append(_BASE32[ch])
+            bits, ch = 0, 0
+    return "".join(chars)
+
+
+def geohash_decode(geohash: str) -> tuple[float, float]:
+    """Center (lat, lon) of a geohash cell."""
+    lat_lo, lat_hi, lon_lo, lon_hi = -90.0, 90.0, -180.0, 180.0
+    even = True
+    for c in geohash:
+        value = _BASE32.index(c)
+        for shift in range(4, -1, -1):
+            bit = (value >> shift) & 1
+            if even:
+                mid = (lon_lo + lon_hi) / 2
+                lon_lo, lon_hi = (mid, lon_hi) if bit else (lon_lo, mid)
+            else:
+                mid = (lat_lo + lat_hi) / 2
+                lat_lo, lat_hi = (mid, lat_hi) if bit else (lat_lo, mid)
+            even = not even
+    return (lat_lo + lat_hi) / 2, (lon_lo + lon_hi) / 2
+
+
+def spatial_cell(lat: float, lon: float, scheme: str = WEATHER_CACHE_KEY, precision: int = WEATHER_CACHE_PRECISION):
+    """
+    Map coordinates to (cache_key, center_lat, center_lon) for their cell.
+    Weather is fetched at the cell center so every query in a cell gets the
+    same upstream answer.
+    """
+    if scheme == "geohash":
+        cell = geohash_encode(lat, lon, precision)
+        center_lat, center_lon = geohash_decode(cell)
+        return f"gh:{cell}", round(center_lat, 6), round(center_lon, 6)
+
+    center_lat, center_lon = round(lat, precision) + 0.0, round(lon, precision) + 0.0  # no '-0.00' keys
+    return f"grid{precision}:{center_lat:.{precision}f},{center_lon:.{precision}f}", center_lat, center_lon
@@ -1,8 +1,41 @@
+import time
+
 def kelvin_to_celsius(k: float) -> float:
     return round(k - 273.15, 1)
 
 def kelvin_to_fahrenheit(k: float) -> float:
     return round((k - 273.15) * 9/5 + 32, 1)
 
+def celsius_to_fahrenheit(c: float) -> float:
+    return round(c * 9/5 + 32, 1)
+
+def ms_to_mph(speed: float) -> float:
+    return round(speed * 2.23694, 1)
+
 def format_temp(temp_c: float) -> str:
     return f"{temp_c}°C"
+
+def normalize_location(location: str) -> str:
+    """Canonical cache key for a location string: lowercase, single-spaced, no trailing punctuation."""
+    return " ".join(location.lower().split()).strip(" ?!.")
+
+def forecast_window(time_ref: str, tz_offset: int = 0, now: float | None = None) -> tuple[int, int]:
+    """
+    [start, end) in epoch seconds for a time reference, in the location's
+    local time (`tz_offset` seconds east of UTC). "later" is the next 12 hours.
+    """
+    now = int(time.time() if now is None else now)
+    day, hour = 86400, 3600
+    local = now + tz_offset
+    midnight = local - local % day - tz_offset  # start of the local day
+    if time_ref == "today":
+        return now, midnight + day
+    if time_ref == "tonight":
+        return max(now, midnight + 18 * hour), midnight + day + 6 * hour
+    if time_ref == "tomorrow":
+        return midnight + day, midnight + 2 * day
+    if time_ref == "weekend":
+        weekday = (local // day + 3) % 7  # Monday = 0; 1970-01-01 was a Thursday
+        saturday = midnight + (5 - weekday) * day
+        return max(now, saturday), saturday + 2 * day
+    return now, now + 12 * hour
@@ -0,0 +1,44 @@
+import os
+import httpx
+
+# One pooled client per process so repeated OpenWeather calls reuse the same
+# keep-alive connection instead of paying a new TCP + TLS handshake each time.
+HTTP_TIMEOUT = httpx.Timeout(
+    float(os.getenv("HTTP_TIMEOUT", "10")),
+    connect=float(os.getenv("HTTP_CONNECT_TIMEOUT", "3")),
+)
+HTTP_LIMITS = httpx.Limits(
+    max_connections=int(os.getenv("HTTP_MAX_CONNECTIONS", "100")),
+    max_keepalive_connections=int(os.getenv("HTTP_MAX_KEEPALIVE", "20")),
+    keepalive_expiry=float(os.getenv("HTTP_KEEPALIVE_EXPIRY", "30")),
+)
+
+_async_client: httpx.AsyncClient | None = None
+_sync_client: httpx.Client | None = None
+
+
+def get_async_client() -> httpx.AsyncClient:
+    """Shared keep-alive client for calls made from the event loop."""
+    global _async_client
+    if _async_client is None or _async_client.is_closed:
+        _async_client = httpx.AsyncClient(timeout=HTTP_TIMEOUT, limits=HTTP_LIMITS)
+    return _async_client
+
+
+def get_sync_client() -> httpx.Client:
+    """Shared keep-alive client for the threaded (sync) code path."""
+    global _sync_client
+    if _sync_client is None or _sync_client.is_closed:
+        _sync_client = httpx.Client(timeout=HTTP_TIMEOUT, limits=HTTP_LIMITS)
+    return _sync_client
+
+
+async def close_clients():
+    """Close pooled connections; call once on application shutdown."""
+    global _async_client, _sync_client
+    if _async_client is not None:
+        await _async_client.aclose()
+        _async_client = None
+    if _sync_client is not None:
+        _sync_client.close()
+        _sync_client = None
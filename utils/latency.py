@@ -0,0 +1,76 @@
+import math
+import threading
+import time
+from collections import deque
+from functools import wraps
+from utils.metrics import GRAPH_NODE_SECONDS
+
+LATENCY_SAMPLES = 10000
+
+
+def percentile(sorted_samples: list[float], q: float) -> float:
+    """Nearest-rank percentile (q in 0..100) of an already sorted list."""
+    if not sorted_samples:
+        return 0.0
+    rank = max(0, min(len(sorted_samples) - 1, math.ceil(q / 100 * len(sorted_samples)) - 1))
+    return sorted_samples[rank]
+
+
+def summarize(samples) -> dict:
+    ordered = sorted(samples)
+    return {
+        "count": len(ordered),
+        "mean_ms": sum(ordered) / len(ordered) * 1000 if ordered else 0.0,
+        "p50_ms": percentile(ordered, 50) * 1000,
+        "p95_ms": percentile(ordered, 95) * 1000,
+        "p99_ms": percentile(ordered, 99) * 1000,
+        "max_ms": ordered[-1] * 1000 if ordered else 0.0,
+    }
+
+
+class LatencyRecorder:
+    """
+    The last `max_samples` durations (seconds) per name, for percentile
+    summaries. With a `histogram`, each duration is also observed there
+    under the label `label`=name for /metrics.
+    """
+
+    def __init__(self, max_samples: int = LATENCY_SAMPLES, histogram=None, label: str = "name"):
+        self.max_samples = max_samples
+        self.histogram = histogram
+        self.label = label
+        self._samples = {}
+        self._lock = threading.Lock()
+
+    def observe(self, name: str, seconds: float):
+        with self._lock:
+            samples = self._samples.get(name)
+            if samples is None:
+                samples = self._samples[name] = deque(maxlen=self.max_samples)
+            samples.append(seconds)
+        if self.histogram is not None:
+            self.histogram.labels(**{self.label: name}).observe(seconds)
+
+    def timed(self, name: str, fn):
+        """Wrap an async function so each call's duration is observed under `name`."""
+        @wraps(fn)
+        async def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return await fn(*args, **kwargs)
+            finally:
+                self.observe(name, time.perf_counter() - started)
+        return wrapper
+
+    def reset(self):
+        with self._lock:
+            self._samples.clear()
+
+    def summary(self) -> dict:
+        with self._lock:
+            snapshot = {name: list(samples) for name, samples in self._samples.items()}
+        return {name: summarize(samples) for name, samples in snapshot.items()}
+
+
+# Per-node durations of the weather graph.
+node_latency = LatencyRecorder(histogram=GRAPH_NODE_SECONDS, label="node")
@@ -1,29 +1,123 @@
 from loguru import logger
-import sys
+import logging
 import os
+import random
+import sys
+import time
+import uuid
 
+# dev:  colored console at DEBUG + rotating file, written in the calling thread.
+# prod: JSON lines (with per-request fields), queued and written by a
+#       background thread, INFO and up, request logs sampled.
+# off:  no sinks (baseline for measuring logging overhead).
+LOG_MODE = os.getenv("LOG_MODE", "dev")
+LOG_LEVEL = os.getenv("LOG_LEVEL", "DEBUG" if LOG_MODE == "dev" else "INFO")
+# Share of requests whose INFO/DEBUG lines are kept; warnings and errors always are.
+LOG_SAMPLE_RATE = float(os.getenv("LOG_SAMPLE_RATE", "1.0" if LOG_MODE == "dev" else "0.1"))
+# Longest payload/answer text written to a log line.
+LOG_PAYLOAD_CHARS = int(os.getenv("LOG_PAYLOAD_CHARS", "300"))
 
 LOG_FORMAT = "<green>{time:YYYY-MM-DD HH:mm:ss}</green> | " \
              "<level>{level: <8}</level> | " \
              "<cyan>{name}</cyan>:<cyan>{function}</cyan>:<cyan>{line}</cyan> - " \
-             "<level>{message}</level>"
+             "<magenta>{extra[request_id]}</magenta> <level>{message}</level>"
+
+LOG_DIR = "logs"
+
+
+def _sampled(record) -> bool:
+    return record["level"].no >= logging.WARNING or record["extra"].get("sampled", True)
 
 
 logger.remove()
+logger.configure(extra={"request_id": "-"})
 
-# Console logging
-logger.add(sys.stdout, format=LOG_FORMAT, level="DEBUG", colorize=True)
+if LOG_MODE == "prod":
+    logger.add(sys.stdout, level=LOG_LEVEL, serialize=True, enqueue=True, filter=_sampled,
+               backtrace=False, diagnose=False)
+elif LOG_MODE != "off":
+    # Console logging
+    logger.add(sys.stdout, format=LOG_FORMAT, level=LOG_LEVEL, colorize=True, filter=_sampled)
 
+if LOG_MODE != "off":
+    os.makedirs(LOG_DIR, exist_ok=True)
+    logger.add(
+        os.path.join(LOG_DIR, "weather_bot.log"),
+        format=LOG_FORMAT,
+        level="INFO",
+        rotation="1 day",
+        retention="7 days",
+        compression="zip",
+        enqueue=LOG_MODE == "prod",
+        filter=_sampled,
+    )
 
-LOG_DIR = "logs"
-os.makedirs(LOG_DIR, exist_ok=True)
-logger.add(
-    os.path.join(LOG_DIR, "weather_bot.log"),
-    format=LOG_FORMAT,
-    level="INFO",
-    rotation="1 day",
-    retention="7 days",
-    compression="zip"
-)
-
-__all__ = ["logger"]
+
+def brief(value, limit: int = LOG_PAYLOAD_CHARS) -> str:
+    """str(value) cut to `limit` characters, for payloads in log lines."""
+    text = str(value)
+    return text if len(text) <= limit else f"{text[:limit]}… ({len(text)} chars)"
+
+
+class InterceptHandler(logging.Handler):
+    """Route stdlib logging (uvicorn, SQLAlchemy, httpx) into loguru's sinks."""
+
+    def emit(self, record: logging.LogRecord):
+        try:
+            level = logger.level(record.levelname).name
+        except ValueError:
+            level = record.levelno
+        frame, depth = logging.currentframe(), 2
+        while frame and frame.f_code.co_filename == logging.__file__:
+            frame = frame.f_back
+            depth += 1
+        logger.opt(depth=depth, exception=record.exc_info).log(level, record.getMessage())
+
+
+def intercept_stdlib_logging(level: int = logging.INFO):
+    logging.basicConfig(handlers=[InterceptHandler()], level=level, force=True)
+    for name in ("uvicorn", "uvicorn.error", "uvicorn.access"):
+        logging.getLogger(name).handlers = [InterceptHandler()]
+        logging.getLogger(name).propagate = False
+
+
+class RequestLogMiddleware:
+    """
+    ASGI middleware that gives every HTTP request an id (X-Request-ID, or a
+    new one) and a sampling decision, attached to all log lines emitted
+    while serving it, and logs one summary line with status and latency.
+    """
+
+    def __init__(self, app, sample_rate: float = LOG_SAMPLE_RATE):
+        self.app = app
+        self.sample_rate = sample_rate
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        headers = dict(scope.get("headers") or [])
+        request_id = headers.get(b"x-request-id", b"")[:64].decode(errors="replace") or uuid.uuid4().hex[:12]
+        status = 500
+
+        async def send_with_id(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                message["headers"] = list(message.get("headers", [])) + [(b"x-request-id", request_id.encode())]
+            await send(message)
+
+        started = time.perf_counter()
+        with logger.contextualize(request_id=request_id, sampled=random.random() < self.sample_rate):
+            try:
+                await self.app(scope, receive, send_with_id)
+            finally:
+                logger.info(
+                    "{method} {path} {status} in {latency_ms:.1f} ms",
+                    method=scope["method"], path=scope["path"], status=status,
+                    latency_ms=(time.perf_counter() - started) * 1000,
+                )
+
+
+__all__ = ["logger", "brief", "intercept_stdlib_logging", "RequestLogMiddleware"]
@@ -0,0 +1,268 @@
+"""
+Minimal Prometheus instrumentation: counters, gauges and histograms with
+labels, rendered in the text exposition format on scrape. Recording is a
+lock plus an add (or a bisect for histograms); all formatting happens only
+when /metrics is requested.
+"""
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from functools import wraps
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", r"\\").replace("\n", r"\n").replace('"', r"\"")
+
+
+def _format_labels(pairs) -> str:
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+
+def _format_value(value) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _CounterChild:
+    __slots__ = ("value", "_lock")
+
+    def __init__(self):
+        self.value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0):
+        with self._lock:
+            self.value += amount
+
+
+class _GaugeChild(_CounterChild):
+    __slots__ = ()
+
+    def dec(self, amount: float = 1.0):
+        self.inc(-amount)
+
+    def set(self, value: float):
+        with self._lock:
+            self.value = value
+
+
+class _HistogramChild:
+    __slots__ = ("buckets", "counts", "sum", "_lock")
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # last slot is +Inf
+        self.sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.sum += value
+
+    @contextmanager
+    def time(self):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started)
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple = (), registry=None):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children = {}
+        self._lock = threading.Lock()
+        (registry if registry is not None else REGISTRY).register(self)
+        if not self.labelnames:
+            self.labels()  # so unlabelled metrics show up before first use
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def labels(self, **labels):
+        key = tuple(labels[name] for name in self.labelnames)
+        child = self._children.get(key)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(key, self._new_child())
+        return child
+
+    def _samples_of(self, child):
+        raise NotImplementedError
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            children = list(self._children.items())
+        for key, child in children:
+            pairs = list(zip(self.labelnames, key))
+            for suffix, extra, value in self._samples_of(child):
+                lines.append(f"{self.name}{suffix}{_format_labels(pairs + extra)} {_format_value(value)}")
+        return lines
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def _new_child(self):
+        return _CounterChild()
+
+    def inc(self, amount: float = 1.0):
+        self.labels().inc(amount)
+
+    def _samples_of(self, child):
+        return [("", [], child.value)]
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def _new_child(self):
+        return _GaugeChild()
+
+    def inc(self, amount: float = 1.0):
+        self.labels().inc(amount)
+
+    def dec(self, amount: float = 1.0):
+        self.labels().dec(amount)
+
+    def _samples_of(self, child):
+        return [("", [], child.value)]
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple = (), buckets=DEFAULT_BUCKETS, registry=None):
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, documentation, labelnames, registry)
+
+    def _new_child(self):
+        return _HistogramChild(self.buckets)
+
+    def observe(self, value: float):
+        self.labels().observe(value)
+
+    def _samples_of(self, child):
+        with child._lock:
+            counts, total = list(child.counts), child.sum
+        samples, cumulative = [], 0
+        for bound, count in zip(self.buckets + (float("inf"),), counts):
+            cumulative += count
+            samples.append(("_bucket", [("le", _format_value(float(bound)))], cumulative))
+        samples.append(("_sum", [], total))
+        samples.append(("_count", [], cumulative))
+        return samples
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+        self._collectors = []
+
+    def register(self, metric: _Metric):
+        self._metrics.append(metric)
+
+    def register_stats(self, prefix: str, documentation: str, stats_fn):
+        """Export every numeric value of `stats_fn()` as gauge `<prefix>_<key>`, read at scrape time."""
+        self._collectors.append((prefix, documentation, stats_fn))
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        for prefix, documentation, stats_fn in self._collectors:
+            try:
+                stats = stats_fn()
+            except Exception:
+                continue
+            for key, value in stats.items():
+                if isinstance(value, (int, float)) and not isinstance(value, bool):
+                    name = f"{prefix}_{key}"
+                    lines += [f"# HELP {name} {documentation} ({key})", f"# TYPE {name} gauge", f"{name} {_format_value(value)}"]
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# ----------------------------------------------------------------------
+# Application metrics
+# ----------------------------------------------------------------------
+GRAPH_NODE_SECONDS = Histogram("weather_graph_node_seconds", "Time spent in each weather graph node", ("node",))
+UPSTREAM_SECONDS = Histogram("weather_upstream_request_seconds", "Outbound call latency", ("target", "op"))
+UPSTREAM_ERRORS = Counter("weather_upstream_errors_total", "Outbound calls that raised", ("target", "op"))
+CACHE_LOOKUPS = Counter("weather_cache_lookups_total", "Weather cache lookups by tier and result", ("tier", "result"))
+REQUESTS_IN_FLIGHT = Gauge("weather_http_requests_in_flight", "HTTP requests currently being served")
+REQUEST_SECONDS = Histogram("weather_http_request_seconds", "HTTP request latency", ("path", "status"))
+
+
+@contextmanager
+def track_upstream(target: str, op: str):
+    """Time an outbound call and count it as an error if it raises."""
+    started = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        UPSTREAM_ERRORS.labels(target=target, op=op).inc()
+        raise
+    finally:
+        UPSTREAM_SECONDS.labels(target=target, op=op).observe(time.perf_counter() - started)
+
+
+def instrumented(target: str):
+    """Decorator form of `track_upstream` for sync functions; op is the function name."""
+    def decorate(fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            with track_upstream(target, fn.__name__):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+class MetricsMiddleware:
+    """ASGI middleware for request latency and in-flight requests, labelled by route template."""
+
+    def __init__(self, app, skip_paths=("/metrics",)):
+        self.app = app
+        self.skip_paths = set(skip_paths)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] in self.skip_paths:
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        in_flight = REQUESTS_IN_FLIGHT.labels()
+        in_flight.inc()
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            in_flight.dec()
+            route = scope.get("route")
+            # route template, not the raw path, to keep label cardinality fixed
+            path = getattr(route, "path", "unmatched")
+            REQUEST_SECONDS.labels(path=path, status=str(status)).observe(time.perf_counter() - started)
@@ -0,0 +1,29 @@
+from datetime import timedelta
+from utils.ttl_cache import TTLCache
+
+
+class NegativeCache:
+    """
+    Keys whose lookup came back empty, remembered for a short `ttl` so a
+    repeat skips the upstream call. Only record definite "not found"
+    answers; transient errors should be retried, not remembered.
+    """
+
+    def __init__(self, ttl: timedelta, max_entries: int = 10000):
+        self._entries = TTLCache(max_entries=max_entries, ttl=ttl)
+        self.recorded = 0
+        self.absorbed = 0  # upstream calls skipped thanks to a negative entry
+
+    def get(self, key: str):
+        """The value recorded for `key` (truthy) or None."""
+        value = self._entries.get(key)
+        if value is not None:
+            self.absorbed += 1
+        return value
+
+    def add(self, key: str, value=True):
+        self._entries.set(key, value)
+        self.recorded += 1
+
+    def stats(self) -> dict:
+        return {"entries": len(self._entries), "recorded": self.recorded, "absorbed": self.absorbed}
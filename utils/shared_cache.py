@@ -0,0 +1,177 @@
+import os
+import pickle
+import sqlite3
+import tempfile
+import threading
+from datetime import datetime, timedelta
+
+_DEFAULT_DIR = "/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir()
+SHARED_CACHE_PATH = os.getenv("L1_SQLITE_PATH", os.path.join(_DEFAULT_DIR, "weather_l1.sqlite"))
+# Expired/over-limit rows are cleaned up once every this many writes.
+SHARED_CACHE_SWEEP_EVERY = int(os.getenv("L1_SQLITE_SWEEP_EVERY", "64"))
+# How long an operation waits for another worker's write lock before the
+# read counts as a miss (or the write is skipped; L2 still has the data).
+SHARED_CACHE_BUSY_TIMEOUT = float(os.getenv("L1_SQLITE_BUSY_TIMEOUT_MS", "50")) / 1000
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS cache (
+    key   TEXT PRIMARY KEY,
+    ts    REAL NOT NULL,
+    value BLOB NOT NULL
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS cache_ts ON cache (ts);
+"""
+
+
+class SQLiteTTLCache:
+    """
+    TTLCache-compatible store in a local SQLite file (WAL mode), so every
+    worker process on a host reads and writes one cache. Each operation is
+    a single statement, hence atomic across processes; a write never
+    replaces an entry with an older timestamp. Eviction beyond
+    `max_entries` drops the oldest entries (by write time, not last read,
+    to keep reads free of writes). Hit/miss counters are per process.
+    Calls block on file locks for up to `busy_timeout`, so async callers
+    should run them in a thread.
+    """
+
+    def __init__(self, path: str = SHARED_CACHE_PATH, max_entries: int = 10000, ttl: timedelta | None = None,
+                 dumps=pickle.dumps, loads=pickle.loads, sweep_every: int = SHARED_CACHE_SWEEP_EVERY,
+                 busy_timeout: float = SHARED_CACHE_BUSY_TIMEOUT):
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.dumps = dumps
+        self.loads = loads
+        self.sweep_every = sweep_every
+        self.busy_timeout = busy_timeout
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.busy = 0  # operations given up on another worker's lock
+        self._writes = 0
+        self._conn = None
+        self._pid = None
+        self._lock = threading.RLock()
+
+    def _db(self) -> sqlite3.Connection:
+        # one connection per process, opened lazily (and again after a fork)
+        if self._conn is None or self._pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=self.busy_timeout, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(_SCHEMA)
+            self._conn, self._pid = conn, os.getpid()
+        return self._conn
+
+    def _gave_up(self, error: sqlite3.OperationalError) -> bool:
+        """True (and counted) if `error` is a lock wait that timed out."""
+        if "locked" not in str(error) and "busy" not in str(error):
+            return False
+        self.busy += 1
+        return True
+
+    def _expired(self, ts: float, now: float) -> bool:
+        return self.ttl is not None and now - ts >= self.ttl.total_seconds()
+
+    def get(self, key, max_age: timedelta | None = None):
+        entry = self.get_entry(key, max_age)
+        return None if entry is None else entry[1]
+
+    def get_entry(self, key, max_age: timedelta | None = None):
+        now = datetime.now().timestamp()
+        with self._lock:
+            try:
+                db = self._db()
+                row = db.execute("SELECT ts, value FROM cache WHERE key = ?", (key,)).fetchone()
+                if row is not None and self._expired(row[0], now):
+                    # only if nobody refreshed it in the meantime
+                    db.execute("DELETE FROM cache WHERE key = ? AND ts = ?", (key, row[0]))
+                    self.expirations += 1
+                    row = None
+            except sqlite3.OperationalError as e:
+                if not self._gave_up(e):
+                    raise
+                row = None
+            if row is None:
+                self.misses += 1
+                return None
+            ts, blob = row
+            if max_age is not None and now - ts >= max_age.total_seconds():
+                self.misses += 1
+                return None
+            self.hits += 1
+        return datetime.fromtimestamp(ts), self.loads(blob)
+
+    def peek(self, key):
+        with self._lock:
+            try:
+                row = self._db().execute("SELECT ts, value FROM cache WHERE key = ?", (key,)).fetchone()
+            except sqlite3.OperationalError as e:
+                if not self._gave_up(e):
+                    raise
+                row = None
+        return None if row is None else (datetime.fromtimestamp(row[0]), self.loads(row[1]))
+
+    def set(self, key, value, timestamp: datetime | None = None):
+        ts = (timestamp or datetime.now()).timestamp()
+        blob = self.dumps(value)
+        with self._lock:
+            try:
+                db = self._db()
+                db.execute(
+                    """
+                    INSERT INTO cache (key, ts, value) VALUES (?, ?, ?)
+                    ON CONFLICT (key) DO UPDATE SET ts = excluded.ts, value = excluded.value
+                    WHERE excluded.ts >= cache.ts
+                    """,
+                    (key, ts, blob),
+                )
+                self._writes += 1
+                if self._writes % self.sweep_every == 0:
+                    self._sweep(db)
+            except sqlite3.OperationalError as e:
+                if not self._gave_up(e):
+                    raise
+
+    def _sweep(self, db: sqlite3.Connection):
+        self.purge_expired()
+        over = db.execute("SELECT COUNT(*) FROM cache").fetchone()[0] - self.max_entries
+        if over > 0:
+            db.execute("DELETE FROM cache WHERE key IN (SELECT key FROM cache ORDER BY ts LIMIT ?)", (over,))
+            self.evictions += over
+
+    def pop(self, key):
+        with self._lock:
+            self._db().execute("DELETE FROM cache WHERE key = ?", (key,))
+
+    def purge_expired(self) -> int:
+        if self.ttl is None:
+            return 0
+        cutoff = datetime.now().timestamp() - self.ttl.total_seconds()
+        with self._lock:
+            removed = self._db().execute("DELETE FROM cache WHERE ts <= ?", (cutoff,)).rowcount
+            self.expirations += removed
+        return removed
+
+    def __contains__(self, key) -> bool:
+        with self._lock:
+            return self._db().execute("SELECT 1 FROM cache WHERE key = ?", (key,)).fetchone() is not None
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._db().execute("SELECT COUNT(*) FROM cache").fetchone()[0]
+
+    def stats(self) -> dict:
+        with self._lock:
+            entries, size = self._db().execute("SELECT COUNT(*), COALESCE(SUM(LENGTH(value)), 0) FROM cache").fetchone()
+            return {
+                "entries": entries,
+                "bytes": size,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "busy": self.busy,
+            }
@@ -0,0 +1,133 @@
+import sys
+import threading
+from collections import OrderedDict
+from itertools import islice
+from datetime import datetime, timedelta
+
+
+def approx_size(value) -> int:
+    """Rough deep size in bytes of a JSON-like value (dict/list/str/number) or slotted record."""
+    size = sys.getsizeof(value)
+    if isinstance(value, dict):
+        size += sum(approx_size(k) + approx_size(v) for k, v in value.items())
+    elif isinstance(value, (list, tuple)):
+        size += sum(approx_size(v) for v in value)
+    elif hasattr(value, "__slots__"):
+        size += sum(approx_size(getattr(value, slot, None)) for slot in value.__slots__)
+    return size
+
+
+class TTLCache:
+    """
+    Thread-safe in-memory cache bounded by entry count and approximate
+    bytes, with LRU eviction and TTL expiry. Timestamps are wall-clock
+    datetimes so entries can be seeded from DB rows with their original age.
+    """
+
+    def __init__(self, max_entries: int = 10000, max_bytes: int | None = None, ttl: timedelta | None = None, sizeof=approx_size):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.sizeof = sizeof
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self._bytes = 0
+        self._entries = OrderedDict()  # key -> (timestamp, value, size)
+        self._lock = threading.RLock()
+
+    def _remove(self, key):
+        _, _, size = self._entries.pop(key)
+        self._bytes -= size
+
+    def get(self, key, max_age: timedelta | None = None):
+        """Atomic get-if-fresh: the value if present and younger than max_age/ttl, else None."""
+        entry = self.get_entry(key, max_age)
+        return None if entry is None else entry[1]
+
+    def get_entry(self, key, max_age: timedelta | None = None):
+        """Like `get` but returns (timestamp, value)."""
+        now = datetime.now()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            ts, value, _ = entry
+            if self.ttl is not None and now - ts >= self.ttl:
+                self._remove(key)
+                self.expirations += 1
+                self.misses += 1
+                return None
+            if max_age is not None and now - ts >= max_age:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return ts, value
+
+    def peek(self, key):
+        """(timestamp, value) without touching LRU order or hit/miss counters."""
+        with self._lock:
+            entry = self._entries.get(key)
+            return None if entry is None else entry[:2]
+
+    def set(self, key, value, timestamp: datetime | None = None):
+        ts = timestamp or datetime.now()
+        size = self.sizeof(value) if self.max_bytes else 0
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (ts, value, size)
+            self._bytes += size
+            self._sweep(datetime.now())
+            while len(self._entries) > self.max_entries or (self.max_bytes and self._bytes > self.max_bytes and len(self._entries) > 1):
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self.evictions += 1
+
+    def _sweep(self, now: datetime, limit: int = 8):
+        # Opportunistically drop a few expired entries from the cold end so
+        # keys that are never read again don't sit around until evicted.
+        if self.ttl is None:
+            return
+        for key in list(islice(self._entries, limit)):
+            if now - self._entries[key][0] >= self.ttl:
+                self._remove(key)
+                self.expirations += 1
+
+    def pop(self, key):
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+
+    def purge_expired(self) -> int:
+        """Drop every expired entry; returns how many were removed."""
+        if self.ttl is None:
+            return 0
+        now = datetime.now()
+        with self._lock:
+            expired = [k for k, (ts, _, _) in self._entries.items() if now - ts >= self.ttl]
+            for key in expired:
+                self._remove(key)
+            self.expirations += len(expired)
+            return len(expired)
+
+    def __contains__(self, key) -> bool:
+        with self._lock:
+            return key in self._entries
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+            }
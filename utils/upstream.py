@@ -0,0 +1,223 @@
+"""
+Outbound-call policy per upstream service: a token bucket for its quota,
+bounded retries with jittered exponential backoff (tenacity), and a
+circuit breaker that fails fast while the service is down so callers can
+fall back to cached data.
+"""
+import asyncio
+import os
+import threading
+import time
+import httpx
+from tenacity import AsyncRetrying, Retrying, retry_if_exception, stop_after_attempt, wait_random_exponential
+
+
+class UpstreamUnavailable(Exception):
+    """The call was not attempted; callers should degrade rather than fail."""
+
+
+class CircuitOpenError(UpstreamUnavailable):
+    pass
+
+
+class QuotaExceededError(UpstreamUnavailable):
+    pass
+
+
+class TokenBucket:
+    """`rate` tokens per second up to `capacity`; one token per outbound attempt."""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _take(self) -> float:
+        """Take a token and return 0, or return how long until one is available."""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return 0.0
+            return (1 - self._tokens) / self.rate
+
+    async def acquire(self, max_wait: float):
+        deadline = time.monotonic() + max_wait
+        while (wait := self._take()) > 0:
+            if time.monotonic() + wait > deadline:
+                raise QuotaExceededError("rate limit reached")
+            await asyncio.sleep(wait)
+
+    def acquire_sync(self, max_wait: float):
+        deadline = time.monotonic() + max_wait
+        while (wait := self._take()) > 0:
+            if time.monotonic() + wait > deadline:
+                raise QuotaExceededError("rate limit reached")
+            time.sleep(wait)
+
+
+class CircuitBreaker:
+    """
+    Opens after `failure_threshold` consecutive failed calls and rejects
+    calls for `reset_timeout` seconds; then lets one probe through
+    (half-open) and closes again if it succeeds.
+    """
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self._opened_at = None
+        self._probing = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        if self._opened_at is None:
+            return "closed"
+        return "open" if time.monotonic() - self._opened_at < self.reset_timeout else "half_open"
+
+    def before_call(self):
+        with self._lock:
+            if self._opened_at is None:
+                return
+            if time.monotonic() - self._opened_at < self.reset_timeout or self._probing:
+                raise CircuitOpenError("circuit open")
+            self._probing = True
+
+    def on_success(self):
+        with self._lock:
+            self.failures = 0
+            self._opened_at = None
+            self._probing = False
+
+    def release(self):
+        """A call ended without reaching the service (quota, cancellation): free its probe slot."""
+        with self._lock:
+            self._probing = False
+
+    def on_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self._probing or self.failures >= self.failure_threshold:
+                self._opened_at = time.monotonic()
+            self._probing = False
+
+
+def retryable_http(exc: BaseException) -> bool:
+    """Network errors, 429 and 5xx are worth retrying; other 4xx are not."""
+    if isinstance(exc, httpx.HTTPStatusError):
+        return exc.response.status_code == 429 or exc.response.status_code >= 500
+    return isinstance(exc, httpx.TransportError)
+
+
+def retryable_llm(exc: BaseException) -> bool:
+    # bad output (validation) won't improve on retry
+    return not isinstance(exc, (ValueError, TypeError, UpstreamUnavailable))
+
+
+class Upstream:
+    def __init__(self, name: str, calls_per_minute: float, burst: float, retries: int, max_wait: float,
+                 breaker: CircuitBreaker, retryable, backoff: float = 0.2, max_backoff: float = 2.0):
+        self.name = name
+        self.bucket = TokenBucket(calls_per_minute / 60, burst)
+        self.retries = retries
+        self.max_wait = max_wait
+        self.breaker = breaker
+        self.retryable = retryable
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.retried = 0
+        self.rejected = 0
+        self.throttled = 0
+
+    def _policy(self) -> dict:
+        return dict(
+            stop=stop_after_attempt(self.retries + 1),
+            wait=wait_random_exponential(multiplier=self.backoff, max=self.max_backoff),
+            retry=retry_if_exception(self.retryable),
+            before_sleep=self._count_retry,
+            reraise=True,
+        )
+
+    def _count_retry(self, retry_state):
+        self.retried += 1
+
+    def _before(self):
+        try:
+            self.breaker.before_call()
+        except CircuitOpenError:
+            self.rejected += 1
+            raise
+
+    def _after_error(self, exc: BaseException):
+        if not isinstance(exc, Exception):
+            # cancelled (or interrupted): says nothing about the service
+            self.breaker.release()
+        elif isinstance(exc, QuotaExceededError):
+            self.throttled += 1
+            self.breaker.release()
+        elif self.retryable(exc):
+            self.breaker.on_failure()
+        else:
+            # the service answered; the request itself was bad
+            self.breaker.on_success()
+
+    async def acall(self, fn, *args, **kwargs):
+        """Await `fn(*args, **kwargs)` under this upstream's quota, retry and breaker policy."""
+        self._before()
+        try:
+            async for attempt in AsyncRetrying(**self._policy()):
+                with attempt:
+                    await self.bucket.acquire(self.max_wait)
+                    result = await fn(*args, **kwargs)
+        except BaseException as e:
+            self._after_error(e)
+            raise
+        self.breaker.on_success()
+        return result
+
+    def call(self, fn, *args, **kwargs):
+        """Sync variant of `acall`."""
+        self._before()
+        try:
+            for attempt in Retrying(**self._policy()):
+                with attempt:
+                    self.bucket.acquire_sync(self.max_wait)
+                    result = fn(*args, **kwargs)
+        except BaseException as e:
+            self._after_error(e)
+            raise
+        self.breaker.on_success()
+        return result
+
+    def stats(self) -> dict:
+        return {
+            "circuit_open": int(self.breaker.state != "closed"),
+            "consecutive_failures": self.breaker.failures,
+            "retries": self.retried,
+            "rejected": self.rejected,
+            "throttled": self.throttled,
+        }
+
+
+def _upstream(name: str, prefix: str, retryable, calls_per_minute: str, burst: str) -> Upstream:
+    env = lambda key, default: float(os.getenv(f"{prefix}_{key}", default))
+    return Upstream(
+        name,
+        calls_per_minute=env("CALLS_PER_MINUTE", calls_per_minute),
+        burst=env("BURST", burst),
+        retries=int(env("RETRIES", "2")),
+        # how long a call may queue for quota before giving up
+        max_wait=env("MAX_QUEUE_SECONDS", "2"),
+        breaker=CircuitBreaker(int(env("BREAKER_FAILURES", "5")), env("BREAKER_RESET_SECONDS", "30")),
+        retryable=retryable,
+    )
+
+
+openweather = _upstream("openweather", "OPENWEATHER", retryable_http, calls_per_minute="600", burst="60")
+llm_upstream = _upstream("llm", "LLM", retryable_llm, calls_per_minute="300", burst="30")